@@ -1,9 +1,7 @@
 import logging
-from prometheus_client import start_http_server
+from concurrent.futures import ThreadPoolExecutor
 import time
-import os
 from decimal import Decimal, ROUND_HALF_UP
-# from args import get_args
 from price_feed import PriceFeedClob
 from gas import GasStation, GasStrategy
 from utils import setup_logging, setup_web3
@@ -13,12 +11,17 @@ from token_class import Token, Collateral
 from clob_api import ClobApi
 from lifecycle import Lifecycle
 from orderbook import OrderBookManager
-from contracts import Contracts
+from contracts import Contracts, Multicall3, DECIMALS
 from metrics import keeper_balance_amount, orders_placed_counter, profit_and_loss_gauge, market_info_gauge, position_gauge
 from strategy import StrategyManager
-import types
+from portfolio import PortfolioBook
 from constants import MIN_TICK
 
+ORDER_BOOK_READY_TIMEOUT = 10
+_SIDE_MAP = {side.value: side for side in Side}
+# an allowance this large is never going to be spent down, no need to re-approve
+MIN_ALLOWANCE = 2**255
+
 class App:
     """Market maker keeper on Polymarket CLOB"""
 
@@ -26,12 +29,10 @@ class App:
         setup_logging()
         self.logger = logging.getLogger(__name__)
         self.logger.setLevel(logging.DEBUG) # Explicitly set to DEBUG for debugging
-        self.logger.debug(f"Initializing the keeper for condsition_id: {condition_id}")
+        self.logger.debug("Initializing the keeper for condsition_id: %s", condition_id)
 
         self.sync_interval = 5
 
-        # self.min_tick = args.min_tick
-        # self.min_size = args.min_size
         args = config
         # server to expose the metrics.
         self.metrics_server_port = args.metrics_server_port
@@ -39,11 +40,31 @@ class App:
         self.web3 = setup_web3(args.rpc_url, args.private_key)
         self.address = self.web3.eth.account.from_key(args.private_key).address
 
-        self.clob_api = ClobApi(
-            host=args.clob_api_url,
-            chain_id=self.web3.eth.chain_id,
-            private_key=args.private_key,
-        )
+        # the startup lookups below are independent network calls, run them concurrently
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            chain_id_future = pool.submit(lambda: self.web3.eth.chain_id)
+            # Multicall3 lets us fetch all the keeper balances in one eth_call,
+            # chains without it (e.g. local devnets) fall back to a JSON-RPC batch request
+            multicall_future = pool.submit(Multicall3.is_deployed, self.web3)
+
+            self.clob_api = ClobApi(
+                host=args.clob_api_url,
+                chain_id=chain_id_future.result(),
+                private_key=args.private_key,
+                warmup=True,
+            )
+
+            # protocol addresses are immutable, fetch them once
+            collateral_future = pool.submit(self.clob_api.get_collateral_address)
+            conditional_future = pool.submit(self.clob_api.get_conditional_address)
+            exchange_future = pool.submit(self.clob_api.get_exchange)
+            market_info_future = pool.submit(self.clob_api.get_market_info, condition_id)
+
+            self._collateral = collateral_future.result()
+            self._conditional = conditional_future.result()
+            self._exchange = exchange_future.result()
+            market_info = market_info_future.result()
+            self.multicall = Multicall3(self.web3) if multicall_future.result() else None
 
         self.gas_station = GasStation(
             strat=GasStrategy(args.gas_strategy),
@@ -55,11 +76,27 @@ class App:
 
         self.market = Market(
             condition_id,
-            self.clob_api.get_collateral_address(),
+            self._collateral,
         )
+        self._token_id_A = self.market.token_id(Token.A)
+        self._token_id_B = self.market.token_id(Token.B)
+        if not self._token_id_A:
+            self.logger.warning("Token A not found for condition id %s", condition_id)
+        if not self._token_id_B:
+            self.logger.warning("Token B not found for condition id %s", condition_id)
+        self._token_ids = {Token.A: self._token_id_A, Token.B: self._token_id_B}
+        self._token_by_id = {
+            token_id: token for token, token_id in self._token_ids.items() if token_id is not None
+        }
+        # the balance calls never change for a keeper, encode them once
+        self._balance_calls = self._build_balance_calls()
+
+        # bind the metric children once instead of resolving the labels on every update
+        self._c_orders_placed = {
+            side: orders_placed_counter.labels(side=side.value) for side in Side
+        }
 
         self.market_slug = None
-        market_info = self.clob_api.get_market_info(condition_id)
         if market_info:
             self.market_slug = market_info.get("slug")
             market_info_gauge.labels(
@@ -92,7 +129,10 @@ class App:
         )
         self.last_balance = None
         self.starting_balance = None
+        self.portfolio = PortfolioBook()
         self.last_balance_update_time = 0
+        # the balance refresh the PnL gauge was last computed from
+        self._pnl_balance_update_time = None
 
     """
     main
@@ -103,6 +143,7 @@ class App:
         with Lifecycle() as lifecycle:
             lifecycle.on_startup(self.startup)
             lifecycle.every(self.sync_interval, self.synchronize)  # Sync every 5s
+            lifecycle.every(self.sync_interval, self.update_pnl)
             lifecycle.on_shutdown(self.shutdown)
 
     """
@@ -116,8 +157,8 @@ class App:
 
         self.logger.info("--- STARTING DEBUGGING OUTPUT ---")
         # --- Debugging: Check collateral balance and allowance ---
-        collateral_token_address = self.clob_api.get_collateral_address()
-        clob_exchange_address = self.clob_api.get_exchange()
+        collateral_token_address = self._collateral
+        clob_exchange_address = self._exchange
 
         if collateral_token_address and clob_exchange_address:
             self.logger.info(f"Collateral Token Address: {collateral_token_address}")
@@ -134,7 +175,10 @@ class App:
             self.logger.warning("Could not retrieve collateral token or CLOB exchange address for debugging.")
         # --- End Debugging ---
 
-        self.order_book_manager.wait_for_order_book_ready()
+        if not self.order_book_manager.wait_for_order_book_ready(timeout=ORDER_BOOK_READY_TIMEOUT):
+            self.logger.warning(
+                f"Order book not ready after {ORDER_BOOK_READY_TIMEOUT} seconds, continuing startup"
+            )
         self.logger.info("Startup complete!")
 
     def synchronize(self):
@@ -145,12 +189,34 @@ class App:
         self.strategy_manager.synchronize()
         self.logger.debug("Synchronized orderbook!")
 
+    def update_pnl(self):
+        """
+        Update the PnL gauge from the last known balances, off the balance refresh path.
+        Only runs once per balance refresh, the price is not worth a request otherwise.
+        """
+        current_balance = self.last_balance
+        if current_balance is None or self.starting_balance is None:
+            return
+        balance_update_time = self.last_balance_update_time
+        if balance_update_time == self._pnl_balance_update_time:
+            return
+
+        try:
+            price_A = self.price_feed.get_price(Token.A)
+            if price_A is not None:
+                self.portfolio.update(0, self.starting_balance, current_balance, price_A)
+                profit_and_loss_gauge.set(self.portfolio.pnl())
+                self._pnl_balance_update_time = balance_update_time
+        except Exception as e:
+            self.logger.error("Could not calculate PnL: %s", e, exc_info=True)
+
     def shutdown(self):
         """
         Shut down the keeper
         """
         self.logger.info("Keeper shutting down...")
         self.order_book_manager.cancel_all_orders()
+        self.clob_api.close()
         self.logger.info("Keeper is shut down!")
 
     """
@@ -168,59 +234,25 @@ class App:
             self.logger.debug("Returning cached balance")
             return self.last_balance
 
-        self.logger.debug(f"Getting balances for address: {self.address}")
+        self.logger.debug("Getting balances for address: %s", self.address)
 
-        collateral_balance = self.contracts.token_balance_of(
-            self.clob_api.get_collateral_address(), self.address
+        collateral_balance, token_A_balance, token_B_balance, gas_balance = (
+            self._fetch_balances()
         )
-        self.logger.debug(f"Collateral balance: {collateral_balance}")
-
-        token_A_balance = 0
-        token_A_id = self.market.token_id(Token.A)
-        if token_A_id:
-            token_A_balance = self.contracts.token_balance_of(
-                self.clob_api.get_conditional_address(),
-                self.address,
-                token_A_id,
-            )
-        else:
-            self.logger.warning(f"Token A not found for condition id {self.market.condition_id}")
-
-        self.logger.debug(f"token a balance is {token_A_balance}")
-        token_B_balance = 0
-        token_B_id = self.market.token_id(Token.B)
-        if token_B_id:
-            token_B_balance = self.contracts.token_balance_of(
-                self.clob_api.get_conditional_address(),
-                self.address,
-                token_B_id,
-            )
-        else:
-            self.logger.warning(f"Token B not found for condition id {self.market.condition_id}")
-        self.logger.debug(f"token b balance is {token_B_balance}")
-        gas_balance = self.contracts.gas_balance(self.address)
-        self.logger.debug(f"I made it to the gas_balance part: {gas_balance}")
-        keeper_balance_amount.labels(
-            accountaddress=self.address,
-            assetaddress=self.clob_api.get_collateral_address(),
-            tokenid="-1",
-        ).set(collateral_balance)
-        keeper_balance_amount.labels(
-            accountaddress=self.address,
-            assetaddress=self.clob_api.get_conditional_address(),
-            tokenid=self.market.token_id(Token.A),
-        ).set(token_A_balance)
-        keeper_balance_amount.labels(
-            accountaddress=self.address,
-            assetaddress=self.clob_api.get_conditional_address(),
-            tokenid=self.market.token_id(Token.B),
-        ).set(token_B_balance)
-        keeper_balance_amount.labels(
-            accountaddress=self.address,
-            assetaddress="0x0",
-            tokenid="-1",
-        ).set(gas_balance)
-        self.logger.debug(f"Collateral balance here: {collateral_balance}")
+        self.logger.debug("Collateral balance: %s", collateral_balance)
+        self.logger.debug("token a balance is %s", token_A_balance)
+        self.logger.debug("token b balance is %s", token_B_balance)
+        self.logger.debug("Gas balance: %s", gas_balance)
+        keeper_balance_amount.update(
+            self.address,
+            {
+                (self._collateral, "-1"): collateral_balance,
+                (self._conditional, self._token_id_A): token_A_balance,
+                (self._conditional, self._token_id_B): token_B_balance,
+                ("0x0", "-1"): gas_balance,
+            },
+        )
+        self.logger.debug("Collateral balance here: %s", collateral_balance)
         current_balance = {
             Collateral: collateral_balance,
             Token.A: token_A_balance,
@@ -228,13 +260,13 @@ class App:
         }
         if self.starting_balance is None:
             self.starting_balance = current_balance
-        self.logger.info(f"Current wallet balance: {collateral_balance}")
+        self.logger.info("Current wallet balance: %s", collateral_balance)
         if self.last_balance:
             for token, balance in current_balance.items():
                 if token in self.last_balance:
                     balance_change = balance - self.last_balance[token]
                     if balance_change != 0:
-                        self.logger.info(f"Balance change for {token}: {balance_change:+.2f}. New balance: {balance:.2f}")
+                        self.logger.info("Balance change for %s: %+.2f. New balance: %.2f", token, balance_change, balance)
 
         self.last_balance = current_balance
         self.last_balance_update_time = current_time
@@ -246,33 +278,88 @@ class App:
                     token=token.name if hasattr(token, 'name') else 'Collateral'
                 ).set(balance)
 
-        # Calculate PnL
-        try:
-            price_A = self.price_feed.get_price(Token.A)
-            if price_A is not None:
-                price_B = 1 - price_A
-                
-                pnl = (current_balance[Collateral] - self.starting_balance[Collateral]) + \
-                      ((current_balance[Token.A] - self.starting_balance[Token.A]) * price_A) + \
-                      ((current_balance[Token.B] - self.starting_balance[Token.B]) * price_B)
+        return current_balance
 
-                profit_and_loss_gauge.set(pnl)
-        except Exception as e:
-            self.logger.error(f"Could not calculate PnL: {e}")
+    def _build_balance_calls(self) -> dict:
+        """
+        Encode the Multicall3 (target, call_data) pairs used to fetch the keeper balances
+        """
+        if self.multicall is None:
+            return {}
 
-        return current_balance
+        calls = {
+            Collateral: (self._collateral, self.contracts.encode_balance_of(self._collateral, self.address)),
+            "gas": (self.multicall.address, self.multicall.encode_get_eth_balance(self.address)),
+        }
+        if self._token_id_A:
+            calls[Token.A] = (
+                self._conditional,
+                self.contracts.encode_balance_of(self._conditional, self.address, self._token_id_A),
+            )
+        if self._token_id_B:
+            calls[Token.B] = (
+                self._conditional,
+                self.contracts.encode_balance_of(self._conditional, self.address, self._token_id_B),
+            )
+        return calls
+
+    def _fetch_balances(self) -> tuple:
+        """
+        Fetch the collateral, token A, token B and gas balances of the keeper.
+        Uses a single Multicall3 eth_call when available so all balances are read at the same block,
+        otherwise a single JSON-RPC batch request.
+        """
+        token_A_id = self._token_id_A
+        token_B_id = self._token_id_B
+
+        if self.multicall is None:
+            token_ids = [token_id for token_id in (token_A_id, token_B_id) if token_id]
+            results = self.contracts.batch_balance_of(
+                self.address, self._collateral, self._conditional, token_ids
+            )
+            collateral_balance, gas_balance = results[0], results[-1]
+            token_balances = dict(zip(token_ids, results[1:-1]))
+            return (
+                float(collateral_balance / DECIMALS),
+                float(token_balances[token_A_id] / DECIMALS) if token_A_id else 0,
+                float(token_balances[token_B_id] / DECIMALS) if token_B_id else 0,
+                self.web3.from_wei(gas_balance, "ether"),
+            )
+
+        calls = self._balance_calls
+        results = self.multicall.aggregate3(list(calls.values()))
+
+        values = {}
+        for key, (success, return_data) in zip(calls.keys(), results):
+            if not success:
+                raise Exception(f"Multicall3 balance call failed for {key}")
+            values[key] = Multicall3.decode_uint256(return_data)
+
+        return (
+            float(values[Collateral] / DECIMALS),
+            float(values[Token.A] / DECIMALS) if Token.A in values else 0,
+            float(values[Token.B] / DECIMALS) if Token.B in values else 0,
+            self.web3.from_wei(values["gas"], "ether"),
+        )
 
     def get_orders(self) -> list[Order]:
+        # always the live list, the order book manager drops the ids it placed and cancelled
+        # on the assumption that this result already reflects them
         orders = self.clob_api.get_orders(self.market.condition_id)
+        # hoist the lookups out of the loop
+        token_of = self._token_by_id.get
+        side_of = _SIDE_MAP.get
         valid_orders = []
+        append = valid_orders.append
         for order_dict in orders:
-            token = self.market.token(order_dict["token_id"])
+            token = token_of(order_dict["token_id"])
             if token:
-                valid_orders.append(
+                side = order_dict["side"]
+                append(
                     Order(
                         size=order_dict["size"],
                         price=order_dict["price"],
-                        side=Side(order_dict["side"]),
+                        side=side_of(side) or Side(side),
                         token=token,
                         id=order_dict["id"],
                     )
@@ -280,27 +367,26 @@ class App:
         return valid_orders
 
     def place_order(self, new_order: Order) -> Order:
-        self.logger.info(f"Placing order: {new_order.side.value} {new_order.size} of {new_order.token} at {new_order.price}")
+        self.logger.info("Placing order: %s %s of %s at %s", new_order.side.value, new_order.size, new_order.token, new_order.price)
         try:
             # Fetch tick size for the token
-            tick_size_str = self.clob_api.client.get_tick_size(self.market.token_id(new_order.token))
+            token_id = self._token_ids[new_order.token]
+            tick_size_str = self.clob_api.client.get_tick_size(token_id)
             tick_size = Decimal(tick_size_str) if tick_size_str else Decimal(str(MIN_TICK))
-            self.logger.debug(f"Fetched tick size for {new_order.token}: {tick_size}")
+            self.logger.debug("Fetched tick size for %s: %s", new_order.token, tick_size)
 
             # Adjust price to tick size
             adjusted_price = self._round_to_tick_size(new_order.price, tick_size)
-            self.logger.debug(f"Original price: {new_order.price}, Adjusted price to tick size ({tick_size}): {adjusted_price}")
+            self.logger.debug("Original price: %s, Adjusted price to tick size (%s): %s", new_order.price, tick_size, adjusted_price)
 
-            orders_placed_counter.labels(
-                side=new_order.side.value
-            ).inc()
+            self._c_orders_placed[new_order.side].inc()
             order_id = self.clob_api.place_order(
                 price=float(adjusted_price), # Use adjusted price
                 size=new_order.size,
                 side=new_order.side.value,
-                token_id=self.market.token_id(new_order.token),
+                token_id=token_id,
             )
-            self.logger.info(f"Successfully placed order {order_id} for {new_order.token}")
+            self.logger.info("Successfully placed order %s for %s", order_id, new_order.token)
             return Order(
                 price=float(adjusted_price), # Use adjusted price
                 size=new_order.size,
@@ -330,15 +416,55 @@ class App:
         """
         self.logger.info("Attempting to approve tokens...")
         self.logger.debug("Approving tokens for the keeper...")
-        collateral = self.clob_api.get_collateral_address()
+        collateral = self._collateral
         if not collateral:
             self.logger.error("Collateral address is not set. Cannot approve.")
             return
-        conditional = self.clob_api.get_conditional_address()
-        exchange = self.clob_api.get_exchange()
-        self.logger.debug(f"Approving {collateral} and {conditional} for {exchange}")
-        self.contracts.max_approve_erc20(collateral, self.address, exchange)
+        conditional = self._conditional
+        exchange = self._exchange
+        self.logger.debug("Approving %s and %s for %s", collateral, conditional, exchange)
 
-        self.contracts.max_approve_erc1155(conditional, self.address, exchange)
+        allowance, approved_for_all = self._get_approvals(collateral, conditional, exchange)
 
-        self.logger.debug("Approvals done!")
\ No newline at end of file
+        calls = []
+        if allowance < MIN_ALLOWANCE:
+            calls.append((collateral, self.contracts.encode_max_approve_erc20(collateral, exchange)))
+        else:
+            self.logger.debug("Skipping ERC20 approval, %s is already approved for %s.", collateral, exchange)
+
+        if not approved_for_all:
+            calls.append((conditional, self.contracts.encode_max_approve_erc1155(conditional, exchange)))
+        else:
+            self.logger.debug("Skipping ERC1155 approval, %s is already approved for all for %s.", conditional, exchange)
+
+        if not calls:
+            self.logger.info("Tokens are already approved.")
+            return
+
+        self.contracts.batch_approvals(self.address, calls)
+
+        self.logger.debug("Approvals done!")
+
+    def _get_approvals(self, collateral: str, conditional: str, exchange: str) -> tuple:
+        """
+        Returns the collateral allowance and the conditional tokens approval of the exchange,
+        read with a single Multicall3 eth_call when available
+        """
+        if self.multicall is not None:
+            (allowance_ok, allowance_data), (approved_ok, approved_data) = self.multicall.aggregate3(
+                [
+                    (collateral, self.contracts.encode_allowance(collateral, self.address, exchange)),
+                    (conditional, self.contracts.encode_is_approved_for_all(conditional, self.address, exchange)),
+                ]
+            )
+            if allowance_ok and approved_ok:
+                return (
+                    Multicall3.decode_uint256(allowance_data),
+                    Multicall3.decode_bool(approved_data),
+                )
+            self.logger.warning("Multicall3 approval check failed, checking approvals one by one")
+
+        return (
+            self.contracts.is_approved_erc20(collateral, self.address, exchange),
+            self.contracts.is_approved_erc1155(conditional, self.address, exchange),
+        )
@@ -1,118 +0,0 @@
-import multiprocessing
-import sys
-import copy
-import time
-import json
-import os
-import logging
-import types # Import types for SimpleNamespace
-
-from app import App
-from args import get_args
-from utils import setup_logging
-
-# The file to read the top market condition_ids from
-MARKET_FILE = "markets_to_trade.json"
-# How often to check the market file for changes
-CHECK_INTERVAL = 10  # seconds
-
-def run_market_maker(config_obj, condition_id: str):
-    """
-    Runs the market maker for a single condition_id.
-    This function is the target for the multiprocessing.Process.
-
-    FIX: This function now accepts a 'config_obj' which is the already-parsed
-    configuration. It does NOT call get_args() again. It passes the config
-    directly to the App.
-    """
-    # A new process needs to have logging configured again.
-    setup_logging()
-    logger = logging.getLogger(__name__)
-    logger.info(f"Starting market maker bot for condition_id: {condition_id}")
-    try:
-        # The config_obj is passed directly to the App. No re-parsing!
-        app = App(config_obj, condition_id)
-        app.main()
-    except KeyboardInterrupt:
-        logger.info(f"Process for {condition_id} received KeyboardInterrupt.")
-    except Exception:
-        logger.exception(f"An error occurred in the market maker bot for {condition_id}")
-
-
-if __name__ == "__main__":
-    # This guard is crucial. Code inside only runs in the main process.
-    setup_logging()
-    logger = logging.getLogger(__name__)
-
-    # 1. Get arguments ONCE and create a base configuration dictionary.
-    base_args_dict = get_args(sys.argv[1:])
-
-    running_bots = {}  # {condition_id: Process}
-
-    try:
-        logger.info("🚀 Starting Bot Runner...")
-        while True:
-            target_condition_ids = []
-            if os.path.exists(MARKET_FILE):
-                try:
-                    with open(MARKET_FILE, 'r') as f:
-                        target_condition_ids = json.load(f)
-                except json.JSONDecodeError:
-                    logger.warning(f"Could not decode JSON from {MARKET_FILE}. Skipping check.")
-                    time.sleep(CHECK_INTERVAL)
-                    continue
-            else:
-                logger.info(f"{MARKET_FILE} not found. Waiting...")
-
-            target_set = set(target_condition_ids)
-            running_set = set(running_bots.keys())
-
-            # --- Stop bots that are no longer in the target list ---
-            bots_to_stop = running_set - target_set
-            for cid in bots_to_stop:
-                logger.info(f"Stopping bot for {cid}...")
-                process = running_bots.pop(cid)
-                process.terminate()
-                process.join(timeout=10)
-                if process.is_alive():
-                    logger.warning(f"Process for {cid} did not terminate gracefully. Killing.")
-                    process.kill()
-                logger.info(f"Bot for {cid} stopped.")
-
-            # --- Start new bots ---
-            bots_to_start = target_set - running_set
-            for cid in bots_to_start:
-                # Create a fresh copy of the config for the new process
-                process_args_dict = copy.deepcopy(base_args_dict)
-
-                # Assign a unique metrics port if needed
-                if cid in target_condition_ids:
-                    port_offset = target_condition_ids.index(cid)
-                    # Ensure metrics_server_port is an integer before arithmetic
-                    base_port = int(process_args_dict.get("metrics_server_port", 9008))
-                    process_args_dict["metrics_server_port"] = base_port + port_offset
-
-                logger.info(f"Starting bot for {cid} on metrics port {process_args_dict['metrics_server_port']}")
-                
-                # It's good practice to convert the dict to a namespace object for cleaner access
-                config_for_process = types.SimpleNamespace(**process_args_dict)
-
-                p = multiprocessing.Process(
-                    target=run_market_maker,
-                    args=(config_for_process, cid) # Pass the final config object
-                )
-                p.start()
-                running_bots[cid] = p
-
-            logger.debug(f"Active bots: {len(running_bots)}. Target markets: {len(target_set)}.")
-            time.sleep(CHECK_INTERVAL)
-
-    except KeyboardInterrupt:
-        logger.info("\n🛑 Shutting down Bot Runner and all active bots...")
-        for cid, process in running_bots.items():
-            logger.info(f"Stopping bot for {cid}...")
-            process.terminate()
-            process.join(timeout=10)
-        logger.info("All bots have been shut down.")
-    except Exception:
-        logger.exception("An unexpected error occurred in the Bot Runner main loop.")
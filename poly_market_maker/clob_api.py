@@ -1,20 +1,218 @@
+import asyncio
 import logging
+import os
 import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import aiohttp
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
 from py_clob_client.client import ClobClient, ApiCreds, OrderArgs, OpenOrderParams, TradeParams
 from py_clob_client.exceptions import PolyApiException
 import pickle
 
 from constants import OK
-from metrics import clob_requests_latency
+from utils import TTLCache
+from metrics import (
+    clob_http_conn_new,
+    clob_http_conn_reused,
+    clob_http_response_bytes,
+    clob_requests_latency,
+)
 
 DEFAULT_PRICE = 0.5
+CLOB_HOST = "https://clob.polymarket.com"
+GAMMA_MARKETS_URL = "https://gamma-api.polymarket.com/markets"
+USER_AGENT = "poly-market-maker"
+ASYNC_CONCURRENCY = 16
+MAX_URL_LENGTH = 2000
+# Gamma market data served from memory within a keeper tick, the deletion flags need to be fresher
+VOLUME_CACHE_TTL = 30
+TO_DELETE_CACHE_TTL = 10
+CONDITION_IDS_PARAM_LEN = len("condition_ids=")
+
+
+class _ConnectionReuseMixin:
+    """
+    Counts whether each request is handed an open kept-alive connection or has to connect first
+    """
+
+    def _get_conn(self, timeout=None):
+        conn = super()._get_conn(timeout)
+        if conn.sock is None:
+            clob_http_conn_new.inc()
+        else:
+            clob_http_conn_reused.inc()
+        return conn
+
+
+class _CountingHTTPConnectionPool(_ConnectionReuseMixin, HTTPConnectionPool):
+    pass
+
+
+class _CountingHTTPSConnectionPool(_ConnectionReuseMixin, HTTPSConnectionPool):
+    pass
+
+
+class _CountingHTTPAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _CountingHTTPConnectionPool,
+            "https": _CountingHTTPSConnectionPool,
+        }
+
+
+def _new_session() -> requests.Session:
+    """
+    HTTP session keeping connections alive across calls, retrying idempotent requests on transient errors
+    """
+    session = requests.Session()
+    session.headers.update({"User-Agent": USER_AGENT})
+    adapter = _CountingHTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=32,
+        max_retries=Retry(
+            total=3,
+            backoff_factor=0.2,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset(["GET"]),
+        ),
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+_latency_children = {}
+
+
+def _observe_latency(method: str, status: str, start_time: float):
+    """
+    Records a CLOB request latency, reusing the labelled histogram child across calls
+    """
+    child = _latency_children.get((method, status))
+    if child is None:
+        child = clob_requests_latency.labels(method=method, status=status)
+        _latency_children[(method, status)] = child
+    child.observe(time.perf_counter() - start_time)
+
+
+def _chunk_condition_ids(condition_ids: list[str], overhead: int) -> list[list[str]]:
+    """
+    Splits condition_ids into chunks whose "condition_ids=..." query keeps the URL under MAX_URL_LENGTH
+    """
+    chunks = []
+    current_chunk = []
+    running_len = overhead
+    for cid in condition_ids:
+        # condition ids are 0x-prefixed hex, urlencoding leaves them as they are
+        cid_len = CONDITION_IDS_PARAM_LEN + len(cid)
+        if current_chunk:
+            if running_len + 1 + cid_len > MAX_URL_LENGTH:
+                chunks.append(current_chunk)
+                current_chunk = []
+                running_len = overhead
+            else:
+                # "&" joining it to the previous id
+                cid_len += 1
+        current_chunk.append(cid)
+        running_len += cid_len
+
+    if current_chunk:
+        chunks.append(current_chunk)
+    return chunks
+
+
+def _is_inactive(market: dict) -> bool:
+    """
+    Whether a Gamma market is inactive, closed or not accepting orders
+    """
+    accepting_orders = market.get("acceptingOrders", market.get("accepting_orders", True))
+    return not market.get("active", True) or market.get("closed", False) or not accepting_orders
+
+
+class _AsyncHttp:
+    """
+    Event loop on a daemon thread sharing one aiohttp session, so sync code can fan requests out concurrently
+    """
+
+    def __init__(self, concurrency: int = ASYNC_CONCURRENCY):
+        self._concurrency = concurrency
+        self._session = None
+        self._semaphore = None
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name="clob-api-async", daemon=True
+        )
+        self._thread.start()
+
+    def run(self, coro, timeout: float = None):
+        """
+        Runs the coroutine on the background loop and blocks for its result
+        """
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result(timeout)
+
+    async def get_json(self, url: str, params: dict):
+        if self._session is None:
+            # created lazily so both belong to the background loop
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=64, limit_per_host=32, ttl_dns_cache=300
+                ),
+                headers={"User-Agent": USER_AGENT},
+                timeout=aiohttp.ClientTimeout(total=10),
+            )
+            self._semaphore = asyncio.Semaphore(self._concurrency)
+
+        async with self._semaphore:
+            async with self._session.get(url, params=params) as response:
+                response.raise_for_status()
+                return await response.json(loads=orjson.loads, content_type=None)
+
+
+_async_http = None
+_async_http_lock = threading.Lock()
+
+
+def _get_async_http() -> _AsyncHttp:
+    global _async_http
+    with _async_http_lock:
+        if _async_http is None:
+            _async_http = _AsyncHttp()
+        return _async_http
+
+
+def _reset_async_http():
+    """
+    The background loop thread does not survive a fork, a forked bot starts its own on first use
+    """
+    global _async_http, _async_http_lock
+    _async_http = None
+    _async_http_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_async_http)
 
 
 class ClobApi:
-    def __init__(self, host= "https://clob.polymarket.com", chain_id= 137, private_key= None):
+    def __init__(self, host= CLOB_HOST, chain_id= 137, private_key= None, warmup= False, _legacy= False):
         self.logger = logging.getLogger(self.__class__.__name__)
+        self.host = host or CLOB_HOST
+        # query get_to_delete with one Gamma request per status filter instead of reading the flags client side,
+        # kept in case Gamma's list mode stops returning active/closed/accepting_orders on each market
+        self._legacy = _legacy
+        self._volume_cache = TTLCache(ttl=VOLUME_CACHE_TTL)
+        self._to_delete_cache = TTLCache(ttl=TO_DELETE_CACHE_TTL)
+        self._session = _new_session()
+        self._address_cache = {}
+        if warmup:
+            threading.Thread(target=self._warmup, name="clob-api-warmup", daemon=True).start()
         import os
         os.environ['SSL_CERT_FILE'] = '/home/kilianschulz/Applications/anaconda3/ssl/cacert.pem'
         if private_key:
@@ -41,114 +239,230 @@ class ClobApi:
         else:
             self.client = None
 
+    def _warmup(self):
+        """
+        Resolves DNS and opens the TLS connections to both hosts ahead of the first real request
+        """
+        for url, params in ((f"{self.host}/ok", None), (GAMMA_MARKETS_URL, {"limit": 1})):
+            try:
+                self._session.head(url, params=params, timeout=5)
+            except Exception as e:
+                self.logger.debug("Warming up the connection to %s failed: %s", url, e)
+
+    def close(self):
+        """
+        Releases the pooled HTTP connections
+        """
+        self._session.close()
+
     def get_address(self):
-        return self.client.get_address()
+        return self._cached_address(("address",), self.client.get_address)
 
     def get_collateral_address(self):
-        return self.client.get_collateral_address()
+        return self._cached_address(("collateral",), self.client.get_collateral_address)
 
     def get_conditional_address(self):
-        return self.client.get_conditional_address()
+        return self._cached_address(("conditional",), self.client.get_conditional_address)
 
     def get_exchange(self, neg_risk = False):
-        return self.client.get_exchange_address(neg_risk)
+        return self._cached_address(
+            ("exchange", bool(neg_risk)),
+            lambda: self.client.get_exchange_address(neg_risk),
+        )
+
+    def _cached_address(self, key: tuple, fetch):
+        """
+        Addresses are fixed by the chain id, key and neg_risk flag, so each one is fetched once
+        """
+        if key not in self._address_cache:
+            self._address_cache[key] = fetch()
+        return self._address_cache[key]
 
     def get_price(self, token_id: int, side: str = None) -> float:
-        self.logger.setLevel(logging.DEBUG)
         """
         Get the current price on the orderbook
         """
-        self.logger.debug(f"Fetching price for token {token_id} with side {side}...")
-        start_time = time.time()
+        self.logger.debug("Fetching price for token %s with side %s...", token_id, side)
+        start_time = time.perf_counter()
+        status = "error"
         try:
             if side:
                 resp = self.client.get_price(token_id, side)
 
                 price = resp.get("price")
             else:
-                self.logger.debug(f"No side provided, fetching midpoint price for the token id {token_id}.")
+                self.logger.debug("No side provided, fetching midpoint price for the token id %s.", token_id)
                 resp = self.client.get_midpoint(token_id)
-                self.logger.debug(f"Midpoint response: {resp}")
-                self.logger.info(f"Midpoint response for {token_id=}: {resp}")
+                self.logger.info("Midpoint response for token_id=%s: %s", token_id, resp)
                 price = resp.get("mid")
 
-            clob_requests_latency.labels(method="get_price", status="ok").observe(
-                (time.time() - start_time)
-            )
+            status = "ok"
             if price is not None:
                 return float(price)
         except Exception as e:
             self.logger.error(f"Error fetching current price from the CLOB API: {e}")
-            clob_requests_latency.labels(method="get_price", status="error").observe(
-                (time.time() - start_time)
-            )
+        finally:
+            _observe_latency("get_price", status, start_time)
         # TODO Return None and handle it in the caller
-        self.logger.setLevel(logging.WARNING)
-        
         return None
 
     def get_book(self, token_id: int):
         """
         Get the order book for a given token
         """
-        self.logger.debug(f"Fetching order book for token {token_id}...")
-        start_time = time.time()
+        self.logger.debug("Fetching order book for token %s...", token_id)
+        start_time = time.perf_counter()
+        status = "error"
         try:
-            api_url = "https://clob.polymarket.com/book"
+            api_url = f"{self.host}/book"
             parameters = {"token_id": token_id}
-            response = requests.get(api_url, params=parameters, timeout=10)
-            self.logger.debug(f"Response: {response.text}")
-            clob_requests_latency.labels(method="get_orderbook", status="ok").observe(
-                (time.time() - start_time)
-            )
-            return response.json()
+            response = self._session.get(api_url, params=parameters, timeout=10)
+            if self.logger.isEnabledFor(logging.DEBUG):
+                # response.text decodes the whole body, only pay for it when it gets logged
+                self.logger.debug("Response: %s", response.text)
+            book = response.json()
+            status = "ok"
+            return book
         except Exception as e:
             self.logger.error(f"Error fetching order book from the CLOB API: {e}")
-            clob_requests_latency.labels(method="get_orderbook", status="error").observe(
-                (time.time() - start_time)
-            )
+        finally:
+            _observe_latency("get_orderbook", status, start_time)
         return None
 
     def get_price_history(self, token_id: int):
         """
         Get the price history for a given token
         """
-        self.logger.debug(f"Fetching price history for token {token_id}...")
-        start_time = time.time()
+        self.logger.debug("Fetching price history for token %s...", token_id)
+        start_time = time.perf_counter()
+        status = "error"
         try:
-            api_url = "https://clob.polymarket.com/prices-history"
+            api_url = f"{self.host}/prices-history"
             parameters = {"market": token_id, "interval": "max"}# "startTs": start_ts, "endTs": end_ts}
-            response = requests.get(api_url, params=parameters, timeout=10)
+            response = self._session.get(api_url, params=parameters, timeout=10)
 
-            clob_requests_latency.labels(method="get_price_history", status="ok").observe(
-                (time.time() - start_time)
-            )
-            return response.json().get("history", [])
+            history = response.json().get("history", [])
+            status = "ok"
+            return history
         except Exception as e:
             self.logger.error(f"Error fetching price history from the CLOB API: {e}")
-            clob_requests_latency.labels(method="get_price_history", status="error").observe(
-                (time.time() - start_time)
+        finally:
+            _observe_latency("get_price_history", status, start_time)
+        return None
+
+    async def aget_book(self, token_id: int):
+        """
+        Get the order book for a given token, without blocking the event loop
+        """
+        start_time = time.perf_counter()
+        status = "error"
+        try:
+            book = await _get_async_http().get_json(
+                f"{self.host}/book", {"token_id": str(token_id)}
             )
+            status = "ok"
+            return book
+        except Exception as e:
+            self.logger.error(f"Error fetching order book from the CLOB API: {e}")
+        finally:
+            _observe_latency("get_orderbook", status, start_time)
         return None
 
+    async def aget_price(self, token_id: int, side: str = None) -> float:
+        """
+        Get the current price on the orderbook, the midpoint if no side is given
+        """
+        start_time = time.perf_counter()
+        status = "error"
+        try:
+            if side:
+                resp = await _get_async_http().get_json(
+                    f"{self.host}/price", {"token_id": str(token_id), "side": side}
+                )
+                price = resp.get("price")
+            else:
+                resp = await _get_async_http().get_json(
+                    f"{self.host}/midpoint", {"token_id": str(token_id)}
+                )
+                price = resp.get("mid")
+
+            status = "ok"
+            if price is not None:
+                return float(price)
+        except Exception as e:
+            self.logger.error(f"Error fetching current price from the CLOB API: {e}")
+        finally:
+            _observe_latency("get_price", status, start_time)
+        return None
+
+    async def aget_price_history(self, token_id: int):
+        """
+        Get the price history for a given token, without blocking the event loop
+        """
+        start_time = time.perf_counter()
+        status = "error"
+        try:
+            resp = await _get_async_http().get_json(
+                f"{self.host}/prices-history",
+                {"market": str(token_id), "interval": "max"},
+            )
+            history = resp.get("history", [])
+            status = "ok"
+            return history
+        except Exception as e:
+            self.logger.error(f"Error fetching price history from the CLOB API: {e}")
+        finally:
+            _observe_latency("get_price_history", status, start_time)
+        return None
+
+    async def aget_book_and_price_history(self, token_id: int) -> tuple:
+        """
+        The order book of a token, and its price history if the book has both bids and asks
+        """
+        book = await self.aget_book(token_id)
+        if not (book and book.get("bids") and book.get("asks")):
+            return book, None
+        return book, await self.aget_price_history(token_id)
+
+    def get_prices(self, token_ids: list[int], side: str = None) -> dict:
+        """
+        Current prices for many tokens, fetched concurrently
+        """
+        return self._gather(self.aget_price, token_ids, side)
+
+    def get_books_and_price_histories(self, token_ids: list[int]) -> dict:
+        """
+        (order book, price history) for many tokens, fetched concurrently.
+        Each history request goes out as soon as its own book arrived.
+        """
+        return self._gather(self.aget_book_and_price_history, token_ids)
+
+    def _gather(self, fetch, token_ids: list[int], *args) -> dict:
+        token_ids = list(token_ids)
+        if not token_ids:
+            return {}
+
+        async def gather():
+            return await asyncio.gather(*[fetch(token_id, *args) for token_id in token_ids])
+
+        return dict(zip(token_ids, _get_async_http().run(gather())))
+
     def get_token_trades(self, token_id: int):
         """
         Get recent trades for a given token
         """
-        self.logger.debug(f"Fetching trades for token {token_id}...")
-        start_time = time.time()
+        self.logger.debug("Fetching trades for token %s...", token_id)
+        start_time = time.perf_counter()
+        status = "error"
         try:
             # Assuming the client has a get_trades method that can filter by token_id
             resp = self.client.get_trades(TradeParams(token_id=token_id))
-            clob_requests_latency.labels(method="get_trades", status="ok").observe(
-                (time.time() - start_time)
-            )
+            status = "ok"
             return resp
         except Exception as e:
             self.logger.error(f"Error fetching trades from the CLOB API: {e}")
-            clob_requests_latency.labels(method="get_trades", status="error").observe(
-                (time.time() - start_time)
-            )
+        finally:
+            _observe_latency("get_trades", status, start_time)
         return None
 
 
@@ -159,21 +473,19 @@ class ClobApi:
         Get open keeper orders on the orderbook
         """
         self.logger.debug("Fetching open keeper orders from the API...")
-        start_time = time.time()
+        start_time = time.perf_counter()
+        status = "error"
         try:
             resp = self.client.get_orders(OpenOrderParams(market=condition_id))
-            clob_requests_latency.labels(method="get_orders", status="ok").observe(
-                (time.time() - start_time)
-            )
+            status = "ok"
 
             return [self._get_order(order) for order in resp]
         except Exception as e:
             self.logger.error(
                 f"Error fetching keeper open orders from the CLOB API: {e}"
             )
-            clob_requests_latency.labels(method="get_orders", status="error").observe(
-                (time.time() - start_time)
-            )
+        finally:
+            _observe_latency("get_orders", status, start_time)
         return []
 
     def place_order(self, price: float, size: float, side: str, token_id: int) -> str:
@@ -181,22 +493,23 @@ class ClobApi:
         Places a new order
         """
         self.logger.debug(
-            f"Attempting to place a {side} order for token {token_id} of size {size} at price {price}"
+            "Attempting to place a %s order for token %s of size %s at price %s", side, token_id, size, price
         )
-        start_time = time.time()
+        start_time = time.perf_counter()
+        status = "error"
         try:
-            self.logger.debug(f"Sending order to CLOB: price={price}, size={size}, side={side}, token_id={token_id}")
+            self.logger.debug(
+                "Sending order to CLOB: price=%s, size=%s, side=%s, token_id=%s", price, size, side, token_id
+            )
             resp = self.client.create_and_post_order(
                 OrderArgs(price=price, size=size, side=side, token_id=token_id)
             )
-            clob_requests_latency.labels(
-                method="create_and_post_order", status="ok"
-            ).observe((time.time() - start_time))
             order_id = None
             if resp and resp.get("success") and resp.get("orderID"):
+                status = "ok"
                 order_id = resp.get("orderID")
                 self.logger.info(
-                    f"Successfully placed {side} order for token {token_id}. Order ID: {order_id}"
+                    "Successfully placed %s order for token %s. Order ID: %s", side, token_id, order_id
                 )
                 return order_id
 
@@ -210,44 +523,40 @@ class ClobApi:
                 self.logger.error(f"Request exception: failed placing new order with parameters price={price}, size={size}, side={side}, token_id={token_id}: PolyApiException[status_code={e.status_code}, error_message={e.error_msg}]", exc_info=True)
             else:
                 self.logger.error(f"Request exception: failed placing new order with parameters price={price}, size={size}, side={side}, token_id={token_id}: {e}", exc_info=True)
-            clob_requests_latency.labels(
-                method="create_and_post_order", status="error"
-            ).observe((time.time() - start_time))
             raise e
+        finally:
+            _observe_latency("create_and_post_order", status, start_time)
 
     def cancel_order(self, order_id) -> bool:
-        self.logger.debug(f"Attempting to cancel order {order_id}...")
+        self.logger.debug("Attempting to cancel order %s...", order_id)
         if order_id is None:
             self.logger.debug("Invalid order_id, skipping cancellation.")
             return True
 
-        start_time = time.time()
+        start_time = time.perf_counter()
+        status = "error"
         try:
             resp = self.client.cancel(order_id)
-            clob_requests_latency.labels(method="cancel", status="ok").observe(
-                (time.time() - start_time)
-            )
+            status = "ok"
             if resp == OK:
-                self.logger.info(f"Successfully cancelled order {order_id}.")
+                self.logger.info("Successfully cancelled order %s.", order_id)
                 return True
             else:
                 self.logger.error(f"Failed to cancel order {order_id}.")
                 return False
         except Exception as e:
             self.logger.error(f"Error cancelling order: {order_id}: {e}")
-            clob_requests_latency.labels(method="cancel", status="error").observe(
-                (time.time() - start_time)
-            )
+        finally:
+            _observe_latency("cancel", status, start_time)
         return False
 
     def cancel_all_orders(self) -> bool:
         self.logger.debug("Attempting to cancel all open keeper orders...")
-        start_time = time.time()
+        start_time = time.perf_counter()
+        status = "error"
         try:
             resp = self.client.cancel_all()
-            clob_requests_latency.labels(method="cancel_all", status="ok").observe(
-                (time.time() - start_time)
-            )
+            status = "ok"
             if resp == OK:
                 self.logger.info("Successfully cancelled all orders.")
                 return True
@@ -256,9 +565,8 @@ class ClobApi:
                 return False
         except Exception as e:
             self.logger.error(f"Error cancelling all orders: {e}")
-            clob_requests_latency.labels(method="cancel_all", status="error").observe(
-                (time.time() - start_time)
-            )
+        finally:
+            _observe_latency("cancel_all", status, start_time)
         return False
 
     def get_market_info(self, condition_id: str):
@@ -268,19 +576,20 @@ class ClobApi:
         if not condition_id:
             return None
 
-        gamma_url = "https://gamma-api.polymarket.com/markets"
+        gamma_url = GAMMA_MARKETS_URL
         parameters = {
             "condition_ids": [condition_id],
         }
 
         try:
-            response = requests.get(gamma_url, params=parameters)
+            response = self._session.get(gamma_url, params=parameters)
+            clob_http_response_bytes.observe(len(response.content))
 
             if response.status_code != 200:
                 self.logger.error(f"Error fetching market info from Gamma API {response.status_code} with {response.text}")
                 return None
             
-            data = response.json()
+            data = orjson.loads(response.content)
             if data and len(data) > 0:
                 return data[0]
             else:
@@ -290,143 +599,200 @@ class ClobApi:
             self.logger.error(f"Exception fetching market info from Gamma API: {e}")
             return None
     
-    def get_volume_and_liquidity(self, condition_ids: list[str]):
-        self.logger.setLevel(logging.DEBUG)
+    def get_volume_and_liquidity(self, condition_ids: list[str], force_refresh: bool = False):
         if not condition_ids:
             return {}, {}
 
-        import urllib.parse
-        gamma_url = "https://gamma-api.polymarket.com/markets"
+        condition_ids = list(dict.fromkeys(condition_ids))
         volume_data = {}
         liquidity_data = {}
 
-        all_chunks = []
-        current_chunk = []
+        to_fetch = []
         for cid in condition_ids:
-            test_chunk = current_chunk + [cid]
-            query_string = urllib.parse.urlencode({"condition_ids": test_chunk}, doseq=True)
+            cached, is_fresh = (None, False) if force_refresh else self._volume_cache.get(cid)
+            if not is_fresh:
+                to_fetch.append(cid)
+            elif cached[0] is not None:
+                volume_data[cid], liquidity_data[cid] = cached
+
+        if to_fetch:
+            fetched_volume, fetched_liquidity, answered = self._fetch_volume_and_liquidity(to_fetch)
+            volume_data.update(fetched_volume)
+            liquidity_data.update(fetched_liquidity)
+            # markets the filters left out are cached too, failed chunks are retried next call
+            for cid in answered:
+                self._volume_cache.set(cid, (fetched_volume.get(cid), fetched_liquidity.get(cid)))
 
-            if len(gamma_url) + 70 + len(query_string) > 2000:
-                if current_chunk:
-                    all_chunks.append(current_chunk)
-                current_chunk = [cid]
-            else:
-                current_chunk.append(cid)
+        if len(volume_data) != len(condition_ids) or len(liquidity_data) != len(condition_ids):
+            self.logger.warning(f"Not all condition IDs found, expected {len(condition_ids)}, got {len(volume_data)} for the volume and {len(liquidity_data)} for the liquidity")
 
-        if current_chunk:
-            all_chunks.append(current_chunk)
-
-        for chunk in all_chunks:
-            parameters = {
-                "condition_ids": chunk,
-                "active": True,
-                "closed": False,
-                "accepting_orders": True,
-                "liquidity_num_min": 100000
-            }
+        return volume_data, liquidity_data
 
-            try:
+    def _fetch_volume_and_liquidity(self, condition_ids: list[str]) -> tuple:
+        """
+        Returns the volume and liquidity by condition ID, and the condition IDs whose chunk was answered
+        """
+        gamma_url = GAMMA_MARKETS_URL
+        volume_data = {}
+        liquidity_data = {}
+        answered = []
 
-                response = requests.get(gamma_url, params=parameters)
+        all_chunks = _chunk_condition_ids(condition_ids, len(gamma_url) + 70)
+        if not all_chunks:
+            return volume_data, liquidity_data, answered
 
-                if response.status_code != 200:
-                    self.logger.error(f"Error fetching volume from Gamma API {response.status_code} with {response.text}   ")
+        # the chunks are independent, fetch them concurrently over the pooled session
+        with ThreadPoolExecutor(max_workers=min(ASYNC_CONCURRENCY, len(all_chunks))) as executor:
+            futures = {
+                executor.submit(self._get_volume_and_liquidity_chunk, gamma_url, chunk): chunk
+                for chunk in all_chunks
+            }
+            for future in as_completed(futures):
+                result = future.result()
+                if result is None:
                     continue
-                try:
-                    data = response.json()
-                except ValueError as e:
-                    self.logger.error(f"Error parsing JSON response from Gamma API: {e}")
-                    continue    
-                
-                for market in data:
-                    condition_id = market.get("conditionId")
-                    if condition_id in chunk:
-
-                        volume_data[condition_id] = market.get("volumeNum", 0)
-                        liquidity_data[condition_id] = market.get("liquidityNum", 0)
-                    else:
-                        continue
+                volume_data.update(result[0])
+                liquidity_data.update(result[1])
+                answered.extend(futures[future])
 
-            except Exception as e:
-                self.logger.error(f"Exception fetching volume from Gamma API: {e}")
+        return volume_data, liquidity_data, answered
 
-        if len(volume_data) != len(condition_ids) or len(liquidity_data) != len(condition_ids):
-            self.logger.warning(f"Not all condition IDs found, expected {len(condition_ids)}, got {len(volume_data)} for the volume and {len(liquidity_data)} for the liquidity")
+    def _get_volume_and_liquidity_chunk(self, gamma_url: str, chunk: list[str]) -> tuple:
+        """
+        Volume and liquidity by condition ID for one chunk of condition IDs, None if the query failed
+        """
+        volume_data = {}
+        liquidity_data = {}
+        parameters = {
+            "condition_ids": chunk,
+            "active": True,
+            "closed": False,
+            "accepting_orders": True,
+            "liquidity_num_min": 100000
+        }
+
+        try:
+            response = self._session.get(gamma_url, params=parameters)
+            clob_http_response_bytes.observe(len(response.content))
+
+            if response.status_code != 200:
+                self.logger.error(f"Error fetching volume from Gamma API {response.status_code} with {response.text}   ")
+                return None
+            try:
+                data = orjson.loads(response.content)
+            except ValueError as e:
+                self.logger.error(f"Error parsing JSON response from Gamma API: {e}")
+                return None
+
+            # the query asked for exactly this chunk, every returned market belongs to it
+            for market in data:
+                market_get = market.get
+                condition_id = market_get("conditionId")
+                if condition_id is not None:
+                    volume_data[condition_id] = market_get("volumeNum", 0)
+                    liquidity_data[condition_id] = market_get("liquidityNum", 0)
+
+        except Exception as e:
+            self.logger.error(f"Exception fetching volume from Gamma API: {e}")
+            return None
 
         return volume_data, liquidity_data
 
-    def get_to_delete(self, condition_ids: list[str]) -> set:
+    def get_to_delete(self, condition_ids: list[str], force_refresh: bool = False) -> set:
         """
-        Get the volume scores for a list of condition IDs.
+        Get the condition IDs of the markets that are inactive, closed or not accepting orders.
         """
         if not condition_ids:
             return set()
 
-        import urllib.parse
-        gamma_url = "https://gamma-api.polymarket.com/markets"
         to_delete = set()
+        to_fetch = []
+        for cid in dict.fromkeys(condition_ids):
+            inactive, is_fresh = (None, False) if force_refresh else self._to_delete_cache.get(cid)
+            if not is_fresh:
+                to_fetch.append(cid)
+            elif inactive:
+                to_delete.add(cid)
+
+        if to_fetch:
+            fetched, answered = self._fetch_to_delete(to_fetch)
+            to_delete |= fetched
+            for cid in answered:
+                self._to_delete_cache.set(cid, cid in fetched)
 
-        all_chunks = []
-        current_chunk = []
-        # longest extra param is "accepting_orders=False"
-        extra_param_len = len("&accepting_orders=False")
-
-        for cid in condition_ids:
-            test_chunk = current_chunk + [cid]
-            query_string = urllib.parse.urlencode({"condition_ids": test_chunk}, doseq=True)
-
-            if len(gamma_url) + 1 + len(query_string) + extra_param_len > 2000:
-                if current_chunk:
-                    all_chunks.append(current_chunk)
-                current_chunk = [cid]
-            else:
-                current_chunk.append(cid)
-
-        if current_chunk:
-            all_chunks.append(current_chunk)
-
-        for chunk in all_chunks:
-            # Request 1: active=False
-            params1 = {"condition_ids": chunk, "active": False}
-            try:
-                response1 = requests.get(gamma_url, params=params1)
-                if response1.status_code == 200:
-                    for market in response1.json():
-                        if market.get("condition_id"):
-                            to_delete.add(market.get("condition_id"))
-                else:
-                    self.logger.error(f"Error fetching activity from Gamma API (active=False): {response1.status_code} {response1.text}")
-            except Exception as e:
-                self.logger.error(f"Exception fetching activity from Gamma API (active=False): {e}")
+        return to_delete
 
-            # Request 2: closed=True
-            params2 = {"condition_ids": chunk, "closed": True}
-            try:
-                response2 = requests.get(gamma_url, params=params2)
-                if response2.status_code == 200:
-                    for market in response2.json():
-                        if market.get("condition_id"):
-                            to_delete.add(market.get("condition_id"))
-                else:
-                    self.logger.error(f"Error fetching activity from Gamma API (closed=True): {response2.status_code} {response2.text}")
-            except Exception as e:
-                self.logger.error(f"Exception fetching activity from Gamma API (closed=True): {e}")
+    def _fetch_to_delete(self, condition_ids: list[str]) -> tuple:
+        """
+        Returns the condition IDs to delete, and the condition IDs whose chunk was fully answered
+        """
+        gamma_url = GAMMA_MARKETS_URL
+        to_delete = set()
 
-            # Request 3: accepting_orders=False
-            params3 = {"condition_ids": chunk, "accepting_orders": False}
-            try:
-                response3 = requests.get(gamma_url, params=params3)
-                if response3.status_code == 200:
-                    for market in response3.json():
-                        if market.get("condition_id"):
-                            to_delete.add(market.get("condition_id"))
+        # longest extra param is "accepting_orders=False"
+        extra_param_len = len("&accepting_orders=False")
+        all_chunks = _chunk_condition_ids(condition_ids, len(gamma_url) + 1 + extra_param_len)
+
+        if self._legacy:
+            # the filters are independent, query all of them for every chunk concurrently
+            queries = [
+                (index, {"condition_ids": chunk, **status_filter}, label, None)
+                for index, chunk in enumerate(all_chunks)
+                for status_filter, label in (
+                    ({"active": False}, "active=False"),
+                    ({"closed": True}, "closed=True"),
+                    ({"accepting_orders": False}, "accepting_orders=False"),
+                )
+            ]
+        else:
+            # one unfiltered query per chunk returns all three flags, filter them here
+            queries = [
+                (index, {"condition_ids": chunk}, "status", _is_inactive)
+                for index, chunk in enumerate(all_chunks)
+            ]
+
+        failed_chunks = set()
+        with ThreadPoolExecutor(max_workers=min(16, len(queries))) as executor:
+            futures = {
+                executor.submit(self._get_filtered_condition_ids, gamma_url, params, label, keep): index
+                for index, params, label, keep in queries
+            }
+            for future in as_completed(futures):
+                result = future.result()
+                if result is None:
+                    failed_chunks.add(futures[future])
                 else:
-                    self.logger.error(f"Error fetching activity from Gamma API (accepting_orders=False): {response3.status_code} {response3.text}")
-            except Exception as e:
-                self.logger.error(f"Exception fetching activity from Gamma API (accepting_orders=False): {e}")
-
-        return to_delete
+                    to_delete |= result
+
+        answered = [
+            cid
+            for index, chunk in enumerate(all_chunks)
+            if index not in failed_chunks
+            for cid in chunk
+        ]
+        return to_delete, answered
         
+    def _get_filtered_condition_ids(self, gamma_url: str, params: dict, label: str, keep=None) -> set:
+        """
+        Condition IDs of the markets matching the Gamma filter in params, and the keep predicate if given.
+        None if the query failed.
+        """
+        condition_ids = set()
+        try:
+            response = self._session.get(gamma_url, params=params, timeout=10)
+            clob_http_response_bytes.observe(len(response.content))
+            if response.status_code != 200:
+                self.logger.error(f"Error fetching activity from Gamma API ({label}): {response.status_code} {response.text}")
+                return None
+            for market in orjson.loads(response.content):
+                condition_id = market.get("conditionId") or market.get("condition_id")
+                if condition_id and (keep is None or keep(market)):
+                    condition_ids.add(condition_id)
+        except Exception as e:
+            self.logger.error(f"Exception fetching activity from Gamma API ({label}): {e}")
+            return None
+        return condition_ids
+
     def _init_client_L1(
         self,
         host,
@@ -1,4 +1,5 @@
 import logging
+import eth_abi
 import web3
 import web3.constants
 
@@ -15,17 +16,46 @@ erc1155_set_approval = """[{"inputs": [{ "internalType": "address", "name": "ope
 erc20_allowance = """[{"constant": true,"inputs": [{"name": "_owner","type": "address"},{"name": "_spender","type": "address"}],"name": "allowance","outputs": [{"name": "","type": "uint256"}],"payable": false,"stateMutability": "view","type": "function"}]"""
 erc1155_is_approved_for_all = """[{"inputs": [{"internalType": "address","name": "account","type": "address"},{"internalType": "address","name": "operator","type": "address"}],"name": "isApprovedForAll","outputs": [{"internalType": "bool","name": "","type": "bool"}],"stateMutability": "view","type": "function"}]"""
 
+multicall3_abi = """[{"inputs": [{"components": [{"internalType": "address","name": "target","type": "address"},{"internalType": "bool","name": "allowFailure","type": "bool"},{"internalType": "bytes","name": "callData","type": "bytes"}],"internalType": "struct Multicall3.Call3[]","name": "calls","type": "tuple[]"}],"name": "aggregate3","outputs": [{"components": [{"internalType": "bool","name": "success","type": "bool"},{"internalType": "bytes","name": "returnData","type": "bytes"}],"internalType": "struct Multicall3.Result[]","name": "returnData","type": "tuple[]"}],"stateMutability": "payable","type": "function"},{"inputs": [{"internalType": "address","name": "addr","type": "address"}],"name": "getEthBalance","outputs": [{"internalType": "uint256","name": "balance","type": "uint256"}],"stateMutability": "view","type": "function"}]"""
+
 DECIMALS = 10**6
 
+# 4 byte selectors of the balance reads, their calldata is built by hand on the hot path
+ERC20_BALANCE_OF_SELECTOR = bytes.fromhex("70a08231")  # balanceOf(address)
+ERC1155_BALANCE_OF_SELECTOR = bytes.fromhex("00fdd58e")  # balanceOf(address,uint256)
+GET_ETH_BALANCE_SELECTOR = bytes.fromhex("4d2301cc")  # getEthBalance(address)
+
+# canonical Multicall3 deployment, same address on every chain it is deployed on
+MULTICALL3_ADDRESS = "0xcA11bde05977b3631167028862bE2a173976CA11"
+
+
+def pad_address(address: str) -> bytes:
+    """
+    ABI encodes an address, left padded to 32 bytes
+    """
+    return bytes.fromhex(address[2:].rjust(64, "0"))
+
 
 class Contracts:
     def __init__(self, w3: web3.Web3, gas_station: GasStation):
         self.w3 = w3
         self.gas_station = gas_station
         self.logger = logging.getLogger(self.__class__.__name__)
+        self._contracts = {}
+
+    def _contract(self, address: str, abi: str):
+        """
+        Returns the contract binding for address and abi, built once and reused afterwards
+        """
+        key = (address, abi)
+        contract = self._contracts.get(key)
+        if contract is None:
+            contract = self.w3.eth.contract(address, abi=abi)
+            self._contracts[key] = contract
+        return contract
 
     def balance_of_erc20(self, token: str, address: str):
-        erc20 = self.w3.eth.contract(token, abi=erc20_balance_of)
+        erc20 = self._contract(token, erc20_balance_of)
         bal = None
 
         try:
@@ -47,7 +77,7 @@ class Contracts:
         assert isinstance(holder_address, str)
         assert isinstance(token_id, int)
 
-        erc1155 = self.w3.eth.contract(erc1155_address, abi=erc1155_balance_of)
+        erc1155 = self._contract(erc1155_address, erc1155_balance_of)
         bal = None
 
         try:
@@ -63,7 +93,7 @@ class Contracts:
         return bal
 
     def is_approved_erc20(self, token: str, owner: str, spender: str):
-        erc20 = self.w3.eth.contract(token, abi=erc20_allowance)
+        erc20 = self._contract(token, erc20_allowance)
 
         try:
             allowance = erc20.functions.allowance(owner, spender).call()
@@ -76,7 +106,7 @@ class Contracts:
         return allowance
 
     def is_approved_erc1155(self, token: str, owner: str, spender: str):
-        erc1155 = self.w3.eth.contract(token, abi=erc1155_is_approved_for_all)
+        erc1155 = self._contract(token, erc1155_is_approved_for_all)
 
         try:
             approved = erc1155.functions.isApprovedForAll(owner, spender).call()
@@ -93,7 +123,7 @@ class Contracts:
     def max_approve_erc20(self, token: str, owner: str, spender: str):
         # self.logger.setLevel(level=logging.DEBUG)
         self.logger.debug(f"Checking approval for {token} on {spender}...")
-        erc20_allowance_contract = self.w3.eth.contract(token, abi=erc20_allowance)
+        erc20_allowance_contract = self._contract(token, erc20_allowance)
         try:
             current_allowance = erc20_allowance_contract.functions.allowance(owner, spender).call()
             chain_requests_counter.labels(method="allowance", status="ok").inc()
@@ -106,7 +136,7 @@ class Contracts:
             self.logger.info(f"ERC20 token {token} is already max approved for {spender}.")
             return None
 
-        erc20_approve_contract = self.w3.eth.contract(token, abi=erc20_approve)
+        erc20_approve_contract = self._contract(token, erc20_approve)
         self.logger.debug(
             f"Max approving ERC20 token {token} on spender {spender}..."
         )
@@ -140,7 +170,7 @@ class Contracts:
     def max_approve_erc1155(self, token: str, owner: str, spender: str):
         # self.logger.setLevel(level=logging.DEBUG)
         self.logger.debug(f"Checking approval for {token} on {spender}...")
-        erc1155_is_approved_contract = self.w3.eth.contract(token, abi=erc1155_is_approved_for_all)
+        erc1155_is_approved_contract = self._contract(token, erc1155_is_approved_for_all)
         try:
             approved = erc1155_is_approved_contract.functions.isApprovedForAll(owner, spender).call()
             chain_requests_counter.labels(method="isApprovedForAll", status="ok").inc()
@@ -156,7 +186,7 @@ class Contracts:
         self.logger.debug(
             f"Max approving ERC1155 token {token} on spender {spender}..."
         )
-        erc1155_set_approval_contract = self.w3.eth.contract(token, abi=erc1155_set_approval)
+        erc1155_set_approval_contract = self._contract(token, erc1155_set_approval)
         self.logger.debug(f"Checking approval for {token} on {spender}...")
         gas_price = self.gas_station.get_gas_price() # Get the gas price
         self.logger.debug(f"Submitting transaction with gas price: {gas_price}")
@@ -207,6 +237,77 @@ class Contracts:
         # self.logger.setLevel(level=logging.INFO)
         return txn_hash_hex
 
+    def encode_allowance(self, token: str, owner: str, spender: str) -> str:
+        erc20 = self._contract(token, erc20_allowance)
+        return erc20.encode_abi("allowance", args=[owner, spender])
+
+    def encode_is_approved_for_all(self, token: str, owner: str, spender: str) -> str:
+        erc1155 = self._contract(token, erc1155_is_approved_for_all)
+        return erc1155.encode_abi("isApprovedForAll", args=[owner, spender])
+
+    def encode_max_approve_erc20(self, token: str, spender: str) -> str:
+        erc20 = self._contract(token, erc20_approve)
+        return erc20.encode_abi(
+            "approve", args=[spender, int(web3.constants.MAX_INT, base=16)]
+        )
+
+    def encode_max_approve_erc1155(self, token: str, spender: str) -> str:
+        erc1155 = self._contract(token, erc1155_set_approval)
+        return erc1155.encode_abi("setApprovalForAll", args=[spender, True])
+
+    def batch_approvals(self, owner: str, calls: list[tuple[str, str]]) -> list[str]:
+        """
+        Sends the (token, call_data) approval transactions back to back with consecutive nonces,
+        then waits for all the receipts so the confirmations overlap instead of running one after the other.
+        """
+        if not calls:
+            return []
+
+        gas_price = self.gas_station.get_gas_price()
+        self.logger.debug(f"Submitting {len(calls)} approval(s) with gas price: {gas_price}")
+
+        try:
+            nonce = self.w3.eth.get_transaction_count(owner, "pending")
+            txn_hashes = []
+            for token, call_data in calls:
+                transaction = {
+                    "from": owner,
+                    "to": token,
+                    "data": call_data,
+                    "gasPrice": gas_price,
+                    "nonce": nonce,
+                }
+                transaction["gas"] = self.w3.eth.estimate_gas(transaction)
+                txn_hash_bytes = self.w3.eth.send_transaction(transaction)
+                chain_requests_counter.labels(method="approve", status="ok").inc()
+                self.logger.info(
+                    f"Approval transaction for {token} sent with hash: {self.w3.to_hex(txn_hash_bytes)}"
+                )
+                txn_hashes.append(txn_hash_bytes)
+                nonce += 1
+
+            for (token, _), txn_hash_bytes in zip(calls, txn_hashes):
+                receipt = self.w3.eth.wait_for_transaction_receipt(txn_hash_bytes)
+                self.logger.info(f"Approval transaction receipt: {receipt}")
+                if receipt.status != 1:
+                    self.logger.error(f"Approval for {token} FAILED. Receipt: {receipt}")
+        except Exception as e:
+            self.logger.error(f"Error approve: {e}")
+            chain_requests_counter.labels(method="approve", status="error").inc()
+            raise e
+
+        return [self.w3.to_hex(txn_hash_bytes) for txn_hash_bytes in txn_hashes]
+
+    @staticmethod
+    def encode_balance_of(token: str, address: str, token_id=None) -> bytes:
+        if token_id is None:
+            return ERC20_BALANCE_OF_SELECTOR + pad_address(address)
+        return (
+            ERC1155_BALANCE_OF_SELECTOR
+            + pad_address(address)
+            + int(token_id).to_bytes(32, byteorder="big")
+        )
+
     def token_balance_of(self, token: str, address: str, token_id=None):
         if token_id is None:
             bal = self.balance_of_erc20(token, address)
@@ -217,6 +318,31 @@ class Contracts:
             return float(bal.balance / DECIMALS)
         return float(bal / DECIMALS)
 
+    def batch_balance_of(
+        self, address: str, collateral: str, conditional: str, token_ids: list[int]
+    ) -> list[int]:
+        """
+        Fetches the collateral balance, the conditional token balances and the gas balance of address
+        with a single JSON-RPC batch request. Values are returned in raw units, in that order.
+        """
+        erc20 = self._contract(collateral, erc20_balance_of)
+        erc1155 = self._contract(conditional, erc1155_balance_of)
+
+        try:
+            with self.w3.batch_requests() as batch:
+                batch.add(erc20.functions.balanceOf(address))
+                for token_id in token_ids:
+                    batch.add(erc1155.functions.balanceOf(address, token_id))
+                batch.add(self.w3.eth.get_balance(address))
+                results = batch.execute()
+            chain_requests_counter.labels(method="batch balanceOf", status="ok").inc()
+        except Exception as e:
+            self.logger.error(f"Error batch balanceOf: {e}")
+            chain_requests_counter.labels(method="batch balanceOf", status="error").inc()
+            raise e
+
+        return results
+
     def gas_balance(self, address):
         bal = None
 
@@ -229,3 +355,55 @@ class Contracts:
             raise e
 
         return self.w3.from_wei(bal, "ether")
+
+
+class Multicall3:
+    """Batches read-only contract calls into a single eth_call"""
+
+    def __init__(self, w3: web3.Web3, address: str = MULTICALL3_ADDRESS):
+        self.w3 = w3
+        self.address = address
+        self.contract = w3.eth.contract(address, abi=multicall3_abi)
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    @staticmethod
+    def is_deployed(w3: web3.Web3, address: str = MULTICALL3_ADDRESS) -> bool:
+        """
+        Checks whether the Multicall3 contract exists on the connected chain (e.g. not on a local devnet)
+        """
+        try:
+            return len(w3.eth.get_code(address)) > 0
+        except Exception as e:
+            logging.getLogger(Multicall3.__name__).warning(
+                f"Could not probe Multicall3 deployment: {e}"
+            )
+            return False
+
+    def aggregate3(self, calls: list[tuple[str, str]]) -> list[tuple[bool, bytes]]:
+        """
+        Executes all (target, call_data) pairs at the same block.
+        Individual calls are allowed to fail, check the success flag of each result.
+        """
+        try:
+            results = self.contract.functions.aggregate3(
+                [(target, True, call_data) for target, call_data in calls]
+            ).call()
+            chain_requests_counter.labels(method="aggregate3", status="ok").inc()
+        except Exception as e:
+            self.logger.error(f"Error aggregate3: {e}")
+            chain_requests_counter.labels(method="aggregate3", status="error").inc()
+            raise e
+
+        return results
+
+    @staticmethod
+    def encode_get_eth_balance(address: str) -> bytes:
+        return GET_ETH_BALANCE_SELECTOR + pad_address(address)
+
+    @staticmethod
+    def decode_uint256(return_data: bytes) -> int:
+        return eth_abi.decode(["uint256"], return_data)[0]
+
+    @staticmethod
+    def decode_bool(return_data: bytes) -> bool:
+        return eth_abi.decode(["bool"], return_data)[0]
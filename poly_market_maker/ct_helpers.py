@@ -1,14 +1,33 @@
 from web3 import Web3
 import json
+import os
+import threading
 from constants import TOKEN_ID_FILE
 
 
 class CTHelpers:
+    _cache: dict = None
+    _cache_mtime: int = None
+    _lock = threading.Lock()
 
     @classmethod
     def get_token_ids(cls, condition_id: str) -> int:
-        with open(TOKEN_ID_FILE, 'r') as f:
-            token_ids = json.load(f)
-        return token_ids.get(condition_id)
+        with cls._lock:
+            # the scoring loop replaces the file while we run, a stat is enough to notice
+            mtime = os.stat(TOKEN_ID_FILE).st_mtime_ns
+            if cls._cache is None or mtime != cls._cache_mtime:
+                with open(TOKEN_ID_FILE, 'r') as f:
+                    cls._cache = json.load(f)
+                cls._cache_mtime = mtime
+            return cls._cache.get(condition_id)
+
+    @classmethod
+    def invalidate(cls):
+        """
+        Drops the parsed token ids, the next lookup reads the file again
+        """
+        with cls._lock:
+            cls._cache = None
+            cls._cache_mtime = None
+
 
-    
@@ -1,8 +1,11 @@
 import logging
+from functools import cached_property
 
 from ct_helpers import CTHelpers
 from token_class import Token
 
+_TOKEN_INDEX = {Token.A: 0, Token.B: 1}
+
 
 class Market:
     def __init__(self, condition_id: str, collateral_address: str):
@@ -14,24 +17,30 @@ class Market:
         self.condition_id = condition_id
         token_ids_list = CTHelpers.get_token_ids(condition_id)
 
-        self.token_ids = {
-            Token.A: token_ids_list[0] if token_ids_list else None,
-            Token.B: token_ids_list[1] if token_ids_list and len(token_ids_list) > 1 else None
-        }
+        # the token id file stores the ids as strings, keep ints so lookups compare like with like
+        self._ids = (
+            int(token_ids_list[0]) if token_ids_list else None,
+            int(token_ids_list[1]) if token_ids_list and len(token_ids_list) > 1 else None,
+        )
+
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug(f"Initialized Market: {self}")
 
-        self.logger.debug(f"Initialized Market: {self}")
+    @cached_property
+    def _repr(self) -> str:
+        return f"Market[condition_id={self.condition_id}, token_id_a={self._ids[0]}, token_id_b={self._ids[1]}]"
 
     def __repr__(self):
-        return f"Market[condition_id={self.condition_id}, token_id_a={self.token_ids[Token.A]}, token_id_b={self.token_ids[Token.B]}]"
+        return self._repr
 
     def token_id(self, token: Token) -> int:
-        token_id = self.token_ids.get(token)
-        return int(token_id) if token_id is not None else None
+        return self._ids[_TOKEN_INDEX[token]]
 
     def token(self, token_id: int) -> Token:
         if token_id is None:
             return None
-        for token in Token:
-            if token_id == self.token_ids[token]:
-                return token
+        if token_id == self._ids[0]:
+            return Token.A
+        if token_id == self._ids[1]:
+            return Token.B
         raise ValueError("Unrecognized token ID")
@@ -1,26 +1,33 @@
+import numpy as np
+import orjson
+from numpy.lib.recfunctions import structured_to_unstructured
 import requests
+import sched
 import time
 import sys
-import json
 import os
 import logging
 import os
 os.environ['SSL_CERT_FILE'] = '/home/kilianschulz/Applications/anaconda3/ssl/cacert.pem'
 
 from datetime import datetime, timedelta, timezone
-from markets import get_polymarket_sports_markets
-from scoring import get_token_score
+from markets import get_polymarket_sports_markets, keep_token_order
+from scoring import get_token_scores, MarketActivity, WeightedScorer, top_n_indices, SCORE_COLUMNS, TOKEN_SCORE_DTYPE
 from clob_api import ClobApi
 import traceback
-from metrics import active_markets_gauge
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from metrics import active_markets_gauge, scoring_phase_latency
 from constants import MARKET_FILE, TOKEN_ID_FILE, DETAILED_MARKET_FILE
+from utils import write_json_atomic
 # --- Configuration ---
 
 # How often to perform actions (in seconds)
 MARKET_UPDATE_INTERVAL = 60 * 60 # Update the list of markets every 10 minutes
 SCORING_INTERVAL = 60 * 60     # Rescore all markets every 5 minutes
 CLEANUP_INTERVAL = 60 * 60 * 2    # Clean up inactive markets every hour
-LOOP_SLEEP_INTERVAL = 60 * 60        # Sleep time for the main loop to prevent high CPU usage
+# Start fetching the market list during a scoring pass when the update is due within this share of its interval
+MARKET_PREFETCH_WINDOW = 0.1
 
 
 # The number of top markets to select for market making
@@ -35,264 +42,242 @@ WEIGHTS = {
     "VOLUME_SCORE": 0.5,
     "VOLATILITY_SCORE": -0.15,
 }
+SCORE_WEIGHTS = np.array([WEIGHTS["SPREAD_SCORE"], WEIGHTS["DEPTH_SCORE"], WEIGHTS["VOLUME_SCORE"], WEIGHTS["VOLATILITY_SCORE"]])
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
 
+def token_details(condition_id: str, market: dict, token_id: str, row) -> dict:
+    """
+    A scored token as a dict, only built for the tokens that get logged or written out
+    """
+    return {
+        'token_id': token_id,
+        'condition_id': condition_id,
+        'market_slug': market.get('market_slug', ''),
+        'question': market.get('question'),
+        **{name: row[name].item() for name in TOKEN_SCORE_DTYPE.names},
+    }
+
+
 # --- Main Application Loop ---
 def main_loop():
     markets = {}
-    last_market_update = 0
-    last_scoring_update = 0
-    last_cleanup = 0
     clobapi = ClobApi(private_key=os.getenv("PRIVATE_KEY", None))
+    scorer = WeightedScorer(SCORE_WEIGHTS)
+    market_activity = MarketActivity()
+    # what was last written to each output file, run_bots and CTHelpers reload them on every change
+    written = {}
 
-    logger.info("🚀 Starting market maker scoring engine...")
-
-    while True:
-        current_time = time.time()
-
-        # --- Task 1: Update the list of markets ---
-        if current_time - last_market_update > MARKET_UPDATE_INTERVAL:
-            logger.info("\n---")
-            logger.info(f"[{datetime.now()}] 🔄 Updating market list...")
+    # the token order of every market written so far, starting from the file the bots already read
+    try:
+        with open(TOKEN_ID_FILE, 'rb') as f:
+            token_order = orjson.loads(f.read())
+    except (FileNotFoundError, orjson.JSONDecodeError):
+        token_order = {}
+
+    def write_if_changed(path, data):
+        if written.get(path) == data:
+            return False
+        write_json_atomic(path, data)
+        written[path] = data
+        return True
+    # every task runs on its own clock, the scheduler sleeps until the next one is due
+    scheduler = sched.scheduler(time.monotonic, time.sleep)
+    # the market list is fetched in the background while a scoring pass waits on the CLOB
+    prefetch_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="market-prefetch")
+    market_prefetch = None
+    next_market_update = 0.0
+
+    def recurring(interval, priority, task):
+        phase_latency = scoring_phase_latency.labels(phase=task.__name__)
+
+        def run():
             try:
-                # This call adds new markets and updates data for existing ones
-                new_markets = get_polymarket_sports_markets()
-                print(f"New markets fetched: {len(new_markets)}")
-
-                markets.update(new_markets)
-                active_markets_gauge.set(len(markets))
-                logger.info(f"Found {len(new_markets)} new/updated markets. Total markets being tracked: {len(markets)}")
-                last_market_update = current_time
-            except Exception as e:
-                logger.error(f"❌ Failed to update markets: {e}")
-            logger.info("---\n")
-
-
-        # --- Task 2: Update the scoring for each token ---
-        if current_time - last_scoring_update > SCORING_INTERVAL:
-            logger.info("\n---")
-            all_tokens = []
-
-            for condition_id, market_obj in markets.items():
-
-                if condition_id == "":
-                    continue
-
-                for token_id in json.loads(market_obj.get('clobTokenIds', [])):
-                    # print(token_id)
-                    token = {}
-                    token['token_id'] = token_id
-                    # Add market slug and condition_id to each token for easier identification
-                    token['market'] = market_obj
-                    token['condition_id'] = condition_id
-
-                    all_tokens.append(token)
-            logger.setLevel(logging.INFO)
-            logger.info(f"[{datetime.now()}] 📊 Scoring all {len(all_tokens)} tracked tokens...")
-
-            logger.info(f"Found {len(all_tokens)} tokens to score.")
-            if all_tokens:
-                # 1. Get raw scores for all tokens
-                raw_scores = []
-                unscorable_tokens = []
-
-                amount_empty_book = 0
-                amount_no_bids = 0
-                amount_no_asks = 0
-                for ind, token in enumerate(all_tokens):
-                    token_id = token.get('token_id')
-                    if token_id:
-                        spread_score, depth_score, volatility_score, price = get_token_score(token_id)
-                        
-                        token_data = {
-                            'token': token,
-                            'token_id': token_id,
-                            'condition_id': token['condition_id'],
-                            'spread': spread_score,
-                            'depth': depth_score,
-                            'volume': float(token['market'].get('volume', 0)),
-                            'liquidity': float(token['market'].get('liquidity', 0)),
-                            'volatility': volatility_score,
-                            'market_slug': token['market'].get('market_slug', ''),
-                            'price': price,
-                        }
-
-                        # Check for unscorable conditions (empty book, invalid price, etc.)
-                        is_unscorable = False
-                        if volatility_score == float('inf'):
-                            if spread_score == 0:
-                                amount_empty_book += 1
-                            elif spread_score == 1:
-                                amount_no_bids += 1
-                            elif spread_score == 2:
-                                amount_no_asks += 1
-                            is_unscorable = True
-                        
-                        if price <= 0.1 or price >= 0.9:
-                            logger.warning(f"Token {token_id} has a price of {price:.2f}, which is too close to the boundaries. Marking as unscorable.")
-                            is_unscorable = True
-
-                        if is_unscorable:
-                            token_data['score'] = 0.0
-                            unscorable_tokens.append(token_data)
-                        else:
-                            raw_scores.append(token_data)
-
-                logger.info(f"{amount_empty_book} tokens had an empty order book, {amount_no_bids} tokens had no bids, and {amount_no_asks} tokens had no asks.")
-
-                # 2. Normalize scores
-                if raw_scores:
-                    # Find min and max for each score type
-                    min_spread = min(s['spread'] for s in raw_scores if s['spread'] > 0)
-                    max_spread = max(s['spread'] for s in raw_scores)
-                    min_depth = min(s['depth'] for s in raw_scores if s['depth'] > 0)
-                    max_depth = max(s['depth'] for s in raw_scores)
-                    min_volume = min(s['volume'] for s in raw_scores if s['volume'] > 0)
-                    max_volume = max(s['volume'] for s in raw_scores)
-                    min_volatility = min(s['volatility'] for s in raw_scores)
-                    if min_volatility == 0:
-                        min_volatility = 1e-10
-                    max_volatility = max(s['volatility'] for s in raw_scores if s['volatility'] != float('inf'))
-                    print(f"Min/Max Spread: {min_spread}/{max_spread}")
-                    print(f"Min/Max Depth: {min_depth}/{max_depth}")
-                    print(f"Min/Max Volume: {min_volume}/{max_volume}")
-                    print(f"Min/Max Volatility: {min_volatility}/{max_volatility}")
-
-                    for token in raw_scores:
-                        # Normalize spread (lower is better)
-                        if max_spread > min_spread:
-                            norm_spread = 1 - ((token['spread'] - min_spread) / (max_spread - min_spread))
-                        else:
-                            norm_spread = 1.0
-
-                        # Normalize depth (higher is better)
-                        if max_depth > min_depth:
-                            norm_depth = (token['depth'] - min_depth) / (max_depth - min_depth)
-                        else:
-                            norm_depth = 1.0
-
-                        # Normalize volume (higher is better)
-                        if max_volume > min_volume:
-                            norm_volume = (token['volume'] - min_volume) / (max_volume - min_volume)
-                        else:
-                            norm_volume = 1.0
-
-                        # Normalize volatility (lower is better)
-                        if max_volatility > min_volatility:
-                            norm_volatility = 1 - ((token['volatility'] - min_volatility) / (max_volatility - min_volatility))
-                        else:
-                            norm_volatility = 1.0
-                        
-                        # 3. Calculate final weighted score
-                        final_score = 100 * (
-                            (norm_spread * WEIGHTS["SPREAD_SCORE"]) +
-                            (norm_depth * WEIGHTS["DEPTH_SCORE"]) +
-                            (norm_volume * WEIGHTS["VOLUME_SCORE"]) + 
-                            (norm_volatility * WEIGHTS["VOLATILITY_SCORE"])
-                        )
-                        token['score'] = final_score
-                        # print(f"The final score for token {score_data['token']['token_id']} is {final_score:.2f}")
-
-                else:
-                    logger.warning("⚠️ No tokens found to score. Skipping scoring step.")
-                    continue
+                with phase_latency.time():
+                    task()
+            finally:
+                scheduler.enter(interval, priority, run)
+                logger.info(f"[{datetime.now()}] 💤 Next {task.__name__} in {interval} seconds...\n")
+        scheduler.enter(0, priority, run)
 
-            else:
-                logger.warning("⚠️ No markets found to score. Skipping scoring step.")
+    logger.info("🚀 Starting market maker scoring engine...")
+
+    # --- Task 1: Update the list of markets ---
+    def update_markets():
+        nonlocal market_prefetch, next_market_update
+        logger.info("\n---")
+        logger.info(f"[{datetime.now()}] 🔄 Updating market list...")
+        next_market_update = time.monotonic() + MARKET_UPDATE_INTERVAL
+        prefetched, market_prefetch = market_prefetch, None
+        try:
+            # This call adds new markets and updates data for existing ones
+            new_markets = prefetched.result() if prefetched else get_polymarket_sports_markets()
+            logger.debug("New markets fetched: %d", len(new_markets))
+
+            markets.update(new_markets)
+            active_markets_gauge.set(len(markets))
+            logger.info(f"Found {len(new_markets)} new/updated markets. Total markets being tracked: {len(markets)}")
+        except Exception as e:
+            logger.error(f"❌ Failed to update markets: {e}")
+        logger.info("---\n")
+
+    # --- Task 2: Update the scoring for each token ---
+    def score_tokens():
+        nonlocal market_prefetch
+        logger.info("\n---")
+        if market_prefetch is None and next_market_update - time.monotonic() < MARKET_UPDATE_INTERVAL * MARKET_PREFETCH_WINDOW:
+            market_prefetch = prefetch_executor.submit(get_polymarket_sports_markets)
+        if market_activity.unchanged(markets):
+            logger.info("No market traded since the last scoring pass. Skipping scoring step.")
+            return
+        changed_markets = market_activity.changed(markets)
+        # each market's token ids, in clobTokenIds order
+        grouped_token_ids = {}
+        for condition_id, market_obj in markets.items():
+            if condition_id == "":
                 continue
-            # Sort and get the top N tokens
-            all_scored_tokens = raw_scores + unscorable_tokens
-            sorted_tokens = sorted(all_scored_tokens, key=lambda t: t.get('score', 0), reverse=True)
-            top_tokens = sorted_tokens[:TOP_N_MARKETS]
-            # Code that prints the top markets by summing their scores from the sorted tokens
-            
-            logger.info(f"\n🏆 Top {TOP_N_MARKETS} Tokens for Market Making:")
-            for token in top_tokens:
-                logger.info(f"  - {token.get('score', 0):.2f} | {token.get('market_slug')} | CID: {token.get('condition_id')} | Token ID: {token.get('token_id')}")
-                logger.info(f" The exact token data is a spread of {token.get('spread', 0):.2f}, depth of {token.get('depth', 0):.2f}, volume of {token.get('volume', 0):.2f}, and volatility of {token.get('volatility', 0):.2f}.")
-
-            logger.info(f"\n For comparison the worst token had a score of {sorted_tokens[-1].get('score', 0):.2f} with a spread of {sorted_tokens[-1].get('spread', 0):.2f}, depth of {sorted_tokens[-1].get('depth', 0):.2f}, volume of {sorted_tokens[-1].get('volume', 0):.2f}, and volatility of {sorted_tokens[-1].get('volatility', 0):.2f}.")
-            # Extract the condition_ids from the top tokens
-            # Create a dictionary to store condition id as key and token ids as values
-            grouped_token_ids = {}
-
-            for token in sorted_tokens:
-                condition_id = token['condition_id']
-                token_id = token['token_id']
-                
-                if condition_id not in grouped_token_ids:
-                    grouped_token_ids[condition_id] = []
-                grouped_token_ids[condition_id].append(token_id)
-
-            top_condition_ids = list(set([token['condition_id'] for token in top_tokens]))
-
-            # Write the condition_ids to the file atomically
-            temp_file_path = f"{MARKET_FILE}.tmp"
-            with open(temp_file_path, 'w') as f:
-                json.dump(top_condition_ids, f)
-            os.rename(temp_file_path, MARKET_FILE)
-
-            # Write the token_ids to the file atomically
-            temp_token_id_file_path = f"{TOKEN_ID_FILE}.tmp"
-            with open(temp_token_id_file_path, 'w') as f:
-                json.dump(grouped_token_ids, f)
-            os.rename(temp_token_id_file_path, TOKEN_ID_FILE)
-
-            # Create and write the detailed market information to a file
-            top_markets_detailed = []
-            for token in top_tokens:
-                market_details = {
-                    'question': token['token']['market'].get('question'),
-                    'market_slug': token.get('market_slug'),
-                    'volume': token.get('volume'),
-                    'price': token.get('price'),
-                    'token_id': token.get('token_id'),
-                    'condition_id': token.get('condition_id'),
-                    'score': token.get('score')
-                }
-                top_markets_detailed.append(market_details)
-
-            temp_detailed_file_path = f"{DETAILED_MARKET_FILE}.tmp"
-            with open(temp_detailed_file_path, 'w') as f:
-                json.dump(top_markets_detailed, f, indent=4)
-            os.rename(temp_detailed_file_path, DETAILED_MARKET_FILE)
-            
-            logger.info(f"\n✅ Wrote {len(top_condition_ids)} market(s) to {MARKET_FILE}")
-            last_scoring_update = current_time
-            logger.info("---\n")
-
-
-        # --- Task 3: Delete inactive/closed markets ---
-        if current_time - last_cleanup > CLEANUP_INTERVAL:
-            logger.info("\n---")
-
-            logger.info(f"[{datetime.now()}] 🧹 Cleaning up inactive markets...")
-            initial_count = len(markets)
-            keys_to_delete = clobapi.get_to_delete(markets.keys())
-            
-            if keys_to_delete:
-                for cid in keys_to_delete:
-                    del markets[cid]
-                logger.info(f"Removed {len(keys_to_delete)} inactive/closed markets.")
-                # Removing the markets from the file
-                with open(MARKET_FILE, 'w') as f:
-                    current_markets = json.load(f)
-                    new_markets = [cid for cid in current_markets if cid not in keys_to_delete]
-                    json.dump(new_markets, f)
-
-                logger.info(f"Updated {MARKET_FILE} with remaining markets.")
+            token_ids = [token_id for token_id in market_obj.get('clobTokenIds', ()) if token_id]
+            if token_ids:
+                grouped_token_ids[condition_id] = token_ids
+        # (condition_id, token_id) pairs, the market data is looked up only for the tokens that get reported
+        all_tokens = [
+            (condition_id, token_id)
+            for condition_id, token_ids in grouped_token_ids.items()
+            for token_id in token_ids
+        ]
+        logger.info(f"[{datetime.now()}] 📊 Scoring all {len(all_tokens)} tracked tokens...")
+
+        logger.info(f"Found {len(all_tokens)} tokens to score.")
+        if all_tokens:
+            # 1. Get raw scores for all tokens
+            # fetch the order books and price histories of every token in concurrent batches
+            token_ids = [token_id for _, token_id in all_tokens]
+            scoring_start = time.perf_counter()
+            # the books of markets that did not trade are served from the score cache
+            changed_tokens = {token_id for condition_id, token_id in all_tokens if condition_id in changed_markets}
+            token_scores = get_token_scores(token_ids, clobapi, changed=changed_tokens)
+
+            # one row per token, filled a column at a time instead of building a dict per token
+            table = np.empty(len(all_tokens), dtype=TOKEN_SCORE_DTYPE)
+            columns = np.array([token_scores[token_id] for token_id in token_ids], dtype=np.float64).reshape(-1, 4)
+            table['spread'], table['depth'], table['volatility'], table['price'] = columns.T
+            # the tokens of a market share its volume and liquidity, read them once per market
+            tokens_per_market = [len(token_ids) for token_ids in grouped_token_ids.values()]
+            for column in ('volume', 'liquidity'):
+                table[column] = np.repeat(
+                    [float(markets[condition_id].get(column, 0)) for condition_id in grouped_token_ids],
+                    tokens_per_market,
+                )
+            table['score'] = 0.0
+
+            # Check for unscorable conditions (empty book, invalid price, etc.)
+            # without a price history the spread column holds the reason the token could not be scored
+            no_history = np.isinf(table['volatility'])
+            unscored_reasons = Counter(table['spread'][no_history].tolist())
+            amount_empty_book = unscored_reasons[0]
+            amount_no_bids = unscored_reasons[1]
+            amount_no_asks = unscored_reasons[2]
+            extreme_price = (table['price'] <= 0.1) | (table['price'] >= 0.9)
+            for i in np.flatnonzero(extreme_price):
+                logger.warning(f"Token {token_ids[i]} has a price of {table['price'][i]:.2f}, which is too close to the boundaries. Marking as unscorable.")
+            scorable = ~(no_history | extreme_price)
+
+            logger.info(f"{amount_empty_book} tokens had an empty order book, {amount_no_bids} tokens had no bids, and {amount_no_asks} tokens had no asks.")
+
+            # 2. Normalize scores
+            if scorable.any():
+                raw = structured_to_unstructured(table[list(SCORE_COLUMNS)][scorable])
+                # 3. Calculate final weighted score
+                scorable_ids = tuple(token_id for token_id, ok in zip(token_ids, scorable) if ok)
+                table['score'][scorable] = scorer.scores(scorable_ids, raw)
+                logger.info(f"Scored {len(scorable_ids)} tokens in {time.perf_counter() - scoring_start:.2f}s")
+
             else:
-                logger.info("No inactive markets to remove.")
-            
-            logger.info(f"Markets being tracked: {len(markets)}")
-            last_cleanup = current_time
-            logger.info("---\n")
+                logger.warning("⚠️ No tokens found to score. Skipping scoring step.")
+                return
+
+        else:
+            logger.warning("⚠️ No markets found to score. Skipping scoring step.")
+            return
+        # Select the top N tokens
+        def details(i):
+            condition_id, token_id = all_tokens[i]
+            return token_details(condition_id, markets[condition_id], token_id, table[i])
+
+        top_tokens = [details(i) for i in top_n_indices(table['score'], TOP_N_MARKETS)]
+        worst_token = details(int(np.argmin(table['score'])))
+        # Code that prints the top markets by summing their scores from the sorted tokens
+        
+        report = []
+        for token in top_tokens:
+            report.append(f"  - {token.get('score', 0):.2f} | {token.get('market_slug')} | CID: {token.get('condition_id')} | Token ID: {token.get('token_id')}")
+            report.append(f" The exact token data is a spread of {token.get('spread', 0):.2f}, depth of {token.get('depth', 0):.2f}, volume of {token.get('volume', 0):.2f}, and volatility of {token.get('volatility', 0):.2f}.")
+        logger.info("\n🏆 Top %d Tokens for Market Making:\n%s", TOP_N_MARKETS, "\n".join(report))
+
+        logger.info(f"\n For comparison the worst token had a score of {worst_token.get('score', 0):.2f} with a spread of {worst_token.get('spread', 0):.2f}, depth of {worst_token.get('depth', 0):.2f}, volume of {worst_token.get('volume', 0):.2f}, and volatility of {worst_token.get('volatility', 0):.2f}.")
+        # Extract the condition_ids from the top tokens
+        top_condition_ids = sorted({token['condition_id'] for token in top_tokens})
+
+        # Write the condition_ids and token_ids to the files atomically, unless they are unchanged
+        if not write_if_changed(MARKET_FILE, top_condition_ids):
+            logger.info(f"Top markets unchanged, not rewriting {MARKET_FILE}")
+        # new markets list their tokens in clobTokenIds order, the markets already in the file keep theirs
+        token_id_file = keep_token_order(grouped_token_ids, token_order)
+        token_order.update(token_id_file)
+        write_if_changed(TOKEN_ID_FILE, token_id_file)
+
+        # Create and write the detailed market information to a file
+        top_markets_detailed = []
+        for token in top_tokens:
+            market_details = {
+                'question': token.get('question'),
+                'market_slug': token.get('market_slug'),
+                'volume': token.get('volume'),
+                'price': token.get('price'),
+                'token_id': token.get('token_id'),
+                'condition_id': token.get('condition_id'),
+                'score': token.get('score')
+            }
+            top_markets_detailed.append(market_details)
+
+        write_json_atomic(DETAILED_MARKET_FILE, top_markets_detailed, indent=True)
+        
+        logger.info(f"\n✅ Wrote {len(top_condition_ids)} market(s) to {MARKET_FILE}")
+        market_activity.mark_scored(markets)
+        logger.info("---\n")
+
+    # --- Task 3: Delete inactive/closed markets ---
+    def clean_up_markets():
+        logger.info("\n---")
+
+        logger.info(f"[{datetime.now()}] 🧹 Cleaning up inactive markets...")
+        initial_count = len(markets)
+        keys_to_delete = clobapi.get_to_delete(markets.keys())
+        
+        if keys_to_delete:
+            # keys_to_delete is a set and usually small, popping in place beats rebuilding the whole dict
+            for cid in keys_to_delete:
+                markets.pop(cid, None)
+            logger.info(f"Removed {len(keys_to_delete)} inactive/closed markets.")
+            # Removing the markets from the file
+            with open(MARKET_FILE, 'rb') as f:
+                current_markets = orjson.loads(f.read())
+            new_markets = [cid for cid in current_markets if cid not in keys_to_delete]
+            write_if_changed(MARKET_FILE, new_markets)
+
+            logger.info(f"Updated {MARKET_FILE} with remaining markets.")
+        else:
+            logger.info("No inactive markets to remove.")
         
-        # Prevent the loop from running too fast
-        time.sleep(LOOP_SLEEP_INTERVAL)
-        logger.info(f"[{datetime.now()}] 💤 Sleeping for {LOOP_SLEEP_INTERVAL} seconds...\n")
+        logger.info(f"Markets being tracked: {len(markets)}")
+        logger.info("---\n")
+
+    # the priorities keep the start-up order: markets, then scores, then the cleanup
+    recurring(MARKET_UPDATE_INTERVAL, 1, update_markets)
+    recurring(SCORING_INTERVAL, 2, score_tokens)
+    recurring(CLEANUP_INTERVAL, 3, clean_up_markets)
+    scheduler.run()
 
 
 
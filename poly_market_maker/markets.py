@@ -1,61 +1,107 @@
-import pickle  
+import functools
 import requests
 import logging
+import orjson
 from datetime import datetime, timedelta, timezone
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 
 logger = logging.getLogger(__name__)
 
-def get_polymarket_sports_markets():
-
-
-
-
-
-
-    # url = f"https://clob.polymarket.com/markets?next_cursor={next_cursor}" 
-    url = f"https://gamma-api.polymarket.com/markets?&limit=50&active=true&closed=false&order=volume"
-
-    response = requests.get(url)
-    data = response.json()
-    print(data)
-
+GAMMA_MARKETS_URL = "https://gamma-api.polymarket.com/markets"
+MARKET_LIMIT = 50
+REQUEST_TIMEOUT = 10
+# the Gamma market fields the market loop reads, the rest of each market is dropped at ingest
+MARKET_FIELDS = (
+    "id",
+    "conditionId",
+    "question",
+    "slug",
+    "market_slug",
+    "clobTokenIds",
+    "outcomePrices",
+    "end_date",
+    "volume",
+    "liquidity",
+    "lastTradePrice",
+    "bestBid",
+    "bestAsk",
+    "active",
+    "closed",
+)
+
+# shared across calls so the connection to Gamma is kept alive between market updates
+_session = requests.Session()
+_session.mount(
+    "https://",
+    HTTPAdapter(
+        pool_connections=8,
+        pool_maxsize=16,
+        max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[502, 503, 504]),
+    ),
+)
+
+def get_polymarket_sports_markets(limit: int = MARKET_LIMIT):
+    """
+    The highest volume active Gamma markets that pass the trading filters, by market id
+    """
+    params = {"limit": limit, "active": "true", "closed": "false", "order": "volume"}
+    response = _session.get(GAMMA_MARKETS_URL, params=params, timeout=REQUEST_TIMEOUT)
     response.raise_for_status()
-
-
-
-
-
-
+    data = orjson.loads(response.content)
 
     # Format each market
     formatted_markets = {}
+    now_utc = datetime.now(timezone.utc)
 
     for market in data:
-        if type(market)!= str:
-            if market.get('active') and not market.get('closed') and market.get('enableOrderBook') and is_end_date_valid(market.get('end_date')) and market.get('outcomePrices'):
-
-                if float(eval(market.get('outcomePrices'))[0]) < 0.1 or float(eval(market.get('outcomePrices'))[1]) > 0.9:
-                    continue
-
-
-                condition_id = market.get('id') 
-                formatted_markets[condition_id] = market
-                if condition_id == '':
-                    import sys
-                    logger.error(f"Skipping market with empty condition_id: {market}")
-                    sys.exit(0)
-            else:
-                print(f"Skipping market {market.get('id')} due to conditions: active={market.get('active')}, closed={market.get('closed')}, accepting_orders={market.get('accepting_orders')}, condition_id={market.get('condition_id')}, end_date_iso={market.get('end_date_iso')}")
-                continue
-        else:
+        # the API returns error strings among the markets
+        if not isinstance(market, dict):
+            continue
+        # cheapest and most selective checks first, the end date parse last
+        if not (
+            market.get('active')
+            and not market.get('closed')
+            and market.get('enableOrderBook')
+            and market.get('outcomePrices')
+            and is_end_date_valid(market.get('end_date'), now_utc)
+        ):
+            logger.debug(
+                "Skipping market %s due to conditions: active=%s, closed=%s, accepting_orders=%s, condition_id=%s, end_date_iso=%s",
+                market.get('id'), market.get('active'), market.get('closed'), market.get('accepting_orders'),
+                market.get('condition_id'), market.get('end_date_iso'),
+            )
+            continue
+
+        outcome_prices = market['outcomePrices']
+        if isinstance(outcome_prices, (str, bytes)):
+            outcome_prices = orjson.loads(outcome_prices)
+        if float(outcome_prices[0]) < 0.1 or float(outcome_prices[1]) > 0.9:
             continue
 
+        condition_id = market.get('id') 
+        if condition_id == '':
+            import sys
+            logger.error(f"Skipping market with empty condition_id: {market}")
+            sys.exit(0)
+        # Gamma sends the token ids as a JSON string, parse them once here instead of on every scoring pass
+        token_ids = market.get('clobTokenIds')
+        if isinstance(token_ids, (str, bytes)):
+            market['clobTokenIds'] = orjson.loads(token_ids)
+        formatted_markets[condition_id] = {field: market[field] for field in MARKET_FIELDS if field in market}
 
-    print(len(formatted_markets), "markets fetched")
+
+    logger.info("%d markets fetched", len(formatted_markets))
     return formatted_markets
 
-def is_end_date_valid(end_date_iso: str | None) -> bool:
+@functools.lru_cache(maxsize=4096)
+def _parse_iso(date_iso: str) -> datetime:
+    # The 'Z' at the end means UTC.
+    return datetime.fromisoformat(date_iso.replace('Z', '+00:00'))
+
+
+def is_end_date_valid(end_date_iso: str | None, now_utc: datetime = None) -> bool:
     """
     Checks if a market's end date is either None or at least 7 days away.
     """
@@ -65,11 +111,11 @@ def is_end_date_valid(end_date_iso: str | None) -> bool:
 
     try:
         # Parse the ISO format string into a timezone-aware datetime object.
-        # The 'Z' at the end means UTC.
-        end_date = datetime.fromisoformat(end_date_iso.replace('Z', '+00:00'))
+        end_date = _parse_iso(end_date_iso)
 
         # Get the current time in UTC to ensure a correct comparison.
-        now_utc = datetime.now(timezone.utc)
+        if now_utc is None:
+            now_utc = datetime.now(timezone.utc)
 
         # Return True if the end date is at least 7 days in the future.
         return end_date - now_utc >= timedelta(days=7)
@@ -78,6 +124,19 @@ def is_end_date_valid(end_date_iso: str | None) -> bool:
         # Handle cases where the date format is invalid or not a string.
         return False
 
+def keep_token_order(grouped_token_ids: dict, token_order: dict) -> dict:
+    """
+    grouped_token_ids with every market already in token_order keeping that token order.
+    Market reads the first id as token A, so a market's legs never swap once a bot may trade it.
+    """
+    ordered = {}
+    for condition_id, token_ids in grouped_token_ids.items():
+        known = token_order.get(condition_id)
+        if known is not None and sorted(known) == sorted(token_ids):
+            token_ids = list(known)
+        ordered[condition_id] = token_ids
+    return ordered
+
 if __name__ == "__main__":
     markets = get_polymarket_sports_markets()
 
@@ -1,5 +1,44 @@
+import gzip
+import threading
+import time
+from wsgiref.simple_server import make_server, WSGIRequestHandler
+
 import requests
-from prometheus_client import Counter, Gauge, Histogram
+from prometheus_client import Counter, Gauge, Histogram, REGISTRY, CONTENT_TYPE_LATEST, generate_latest
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.exposition import ThreadingWSGIServer
+
+
+class KeeperBalanceCollector:
+    """
+    Exposes the latest keeper balances at scrape time.
+    The fetch path only swaps in a new snapshot, no metric locks are taken.
+    """
+
+    def __init__(self):
+        self._snapshot = (None, {})
+
+    def update(self, account_address: str, balances: dict):
+        """
+        Args:
+            account_address: The keeper address.
+            balances: Balance by (assetaddress, tokenid).
+        """
+        self._snapshot = (account_address, balances)
+
+    def collect(self):
+        account_address, balances = self._snapshot
+        family = GaugeMetricFamily(
+            "market_maker_balance_amount",
+            "Balance of the bot",
+            labels=["accountaddress", "assetaddress", "tokenid"],
+        )
+        for (asset_address, token_id), balance in balances.items():
+            family.add_metric(
+                [account_address, asset_address, str(token_id)], float(balance)
+            )
+        yield family
+
 
 chain_requests_counter = Counter(
     "chain_requests_counter",
@@ -7,12 +46,8 @@ chain_requests_counter = Counter(
     labelnames=["method", "status"],
     namespace="market_maker",
 )
-keeper_balance_amount = Gauge(
-    "balance_amount",
-    "Balance of the bot",
-    labelnames=["accountaddress", "assetaddress", "tokenid"],
-    namespace="market_maker",
-)
+keeper_balance_amount = KeeperBalanceCollector()
+REGISTRY.register(keeper_balance_amount)
 clob_requests_latency = Histogram(
     "clob_requests_latency",
     "Latency of the clob requests",
@@ -53,3 +88,77 @@ position_gauge = Gauge(
     labelnames=["market", "token"],
     namespace="market_maker",
 )
+clob_http_conn_new = Counter(
+    "clob_http_conn_new",
+    "HTTP requests that had to open a new connection",
+    namespace="market_maker",
+)
+clob_http_conn_reused = Counter(
+    "clob_http_conn_reused",
+    "HTTP requests served on a kept-alive pooled connection",
+    namespace="market_maker",
+)
+clob_http_response_bytes = Histogram(
+    "clob_http_response_bytes",
+    "Size of the Gamma API response bodies",
+    namespace="market_maker",
+    buckets=(1024, 4096, 16384, 65536, 262144, 1048576, 4194304, float("inf")),
+)
+
+scoring_phase_latency = Histogram(
+    "scoring_phase_latency",
+    "Duration of the market loop tasks",
+    labelnames=["phase"],
+    namespace="market_maker",
+    buckets=(0.01, 0.1, 1, 10, 60, 300, 1800, float("inf")),
+)
+
+
+class _SilentHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        """Don't log every scrape"""
+
+
+def make_cached_metrics_app(registry=REGISTRY, cache_ttl: float = 0.5):
+    """
+    WSGI app exposing the registry. The rendered (and gzipped) output is reused for cache_ttl seconds,
+    so concurrent scrapes share a single render.
+    """
+    lock = threading.Lock()
+    cache = {}
+
+    def app(environ, start_response):
+        accepts_gzip = "gzip" in environ.get("HTTP_ACCEPT_ENCODING", "")
+        with lock:
+            now = time.monotonic()
+            entry = cache.get(accepts_gzip)
+            if entry is None or now >= entry[0]:
+                output = generate_latest(registry)
+                if accepts_gzip:
+                    output = gzip.compress(output)
+                entry = (now + cache_ttl, output)
+                cache[accepts_gzip] = entry
+
+        headers = [("Content-Type", CONTENT_TYPE_LATEST)]
+        if accepts_gzip:
+            headers.append(("Content-Encoding", "gzip"))
+        start_response("200 OK", headers)
+        return [entry[1]]
+
+    return app
+
+
+def start_metrics_server(port: int, addr: str = "0.0.0.0", cache_ttl: float = 0.5):
+    """
+    Serves the metrics on a multithreaded server, in a daemon thread
+    """
+    server = make_server(
+        addr,
+        int(port),
+        make_cached_metrics_app(cache_ttl=cache_ttl),
+        ThreadingWSGIServer,
+        handler_class=_SilentHandler,
+    )
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, thread
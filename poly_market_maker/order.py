@@ -18,6 +18,8 @@ class Side(Enum):
 
 
 class Order:
+    __slots__ = ("size", "price", "side", "token", "id")
+
     def __init__(self, size: float, price: float, side: Side, token: Token, id=None):
         if isinstance(size, int):
             size = float(size)
@@ -58,6 +58,7 @@ class OrderBookManager:
         self._executor = ThreadPoolExecutor(max_workers=max_workers)
         self._lock = threading.Lock()
         self._state = None
+        self._ready = threading.Event()
         self._refresh_count = 0
         self._currently_placing_orders = 0
         self._orders_placed = list()
@@ -129,9 +130,8 @@ class OrderBookManager:
         """
         Returns the current snapshot of the active keeper orders and balances.
         """
-        while self._state is None:
+        while not self._ready.wait(timeout=0.5):
             self.logger.info("Waiting for the order book to become available...")
-            time.sleep(0.5)
 
         with self._lock:
             self.logger.debug("Getting the order book...")
@@ -266,10 +266,16 @@ class OrderBookManager:
             )
             self.wait_for_order_book_refresh()
         
-    def wait_for_order_book_ready(self):
-        """Wait until the order book is ready."""
-        while self._state is None:
-            time.sleep(0.1)
+    def wait_for_order_book_ready(self, timeout: float = None) -> bool:
+        """Wait until the first orders and balances have been fetched.
+
+        Args:
+            timeout: Maximum waiting time (in seconds), waits indefinitely if `None`.
+
+        Returns:
+            `True` if the order book is ready, `False` if the timeout expired first.
+        """
+        return self._ready.wait(timeout=timeout)
 
     def wait_for_order_cancellation(self):
         """Wait until no background order cancellation takes place."""
@@ -364,6 +370,12 @@ class OrderBookManager:
                     # self._state = {'orders': orders, 'balances': balances}
                     self._refresh_count += 1
 
+                    if not self._ready.is_set() and "orders" in self._state and (
+                        "balances" in self._state or self.get_balances_function is None
+                    ):
+                        self._state.setdefault("balances", None)
+                        self._ready.set()
+
                 self._report_order_book_updated()
 
                 self.logger.debug(
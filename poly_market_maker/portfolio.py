@@ -0,0 +1,38 @@
+import numpy as np
+
+from token_class import Token, Collateral
+
+
+class PortfolioBook:
+    """
+    Balance deltas and prices of one or more markets, laid out as arrays so the PnL is a couple of dot products.
+
+    Attributes:
+        -coll_delta: Collateral balance change since start, per market.
+        -a_delta: Token A balance change since start, per market.
+        -b_delta: Token B balance change since start, per market.
+        -price_a: Token A price, per market. Token B is priced at its complement.
+    """
+
+    def __init__(self, size: int = 1):
+        assert isinstance(size, int) and size > 0
+
+        self.coll_delta = np.zeros(size, dtype=np.float64)
+        self.a_delta = np.zeros(size, dtype=np.float64)
+        self.b_delta = np.zeros(size, dtype=np.float64)
+        self.price_a = np.zeros(size, dtype=np.float64)
+
+    def update(
+        self, index: int, starting_balance: dict, current_balance: dict, price_a: float
+    ):
+        self.coll_delta[index] = current_balance[Collateral] - starting_balance[Collateral]
+        self.a_delta[index] = current_balance[Token.A] - starting_balance[Token.A]
+        self.b_delta[index] = current_balance[Token.B] - starting_balance[Token.B]
+        self.price_a[index] = price_a
+
+    def pnl(self) -> float:
+        return float(
+            self.coll_delta.sum()
+            + np.dot(self.a_delta, self.price_a)
+            + np.dot(self.b_delta, 1.0 - self.price_a)
+        )
@@ -1,19 +1,18 @@
 import multiprocessing
 import sys
-import copy
 import time
 from strategy import Strategy
-from prometheus_client import start_http_server
-import json
+import orjson
 import os
 import logging
 import types
 from enum import Enum
 from app import App
 from dotenv import load_dotenv
-from utils import setup_logging
+from utils import setup_logging, write_json_atomic
 from clob_api import ClobApi
 from market import Market, Token
+from metrics import start_metrics_server
 
 # 1. Load environment variables from a .env file into the OS environment.
 # This should be done at the very top of the script.
@@ -40,61 +39,87 @@ DEFAULT_CONFIG = {
 # --- Main Application Logic ---
 
 MARKET_FILE = "markets_to_trade.json"
-CHECK_INTERVAL = 10  # seconds
+CHECK_INTERVAL = 1  # seconds, only a stat of the market file unless it changed
+RECONCILE_INTERVAL = 60  # seconds, restart dead bots and retry the markets whose pre-flight check failed
+STOP_TIMEOUT = 10  # seconds the bots get to exit after a terminate, shared by all bots stopped together
 
-def run_market_maker(config_obj, condition_id: str):
+def load_config():
+    """
+    Builds the configuration from the defaults and the environment variables.
+    """
+    config_dict = DEFAULT_CONFIG.copy()
+    for key in config_dict:
+        env_value = os.environ.get(key.upper())
+        if env_value is not None:
+            config_dict[key] = env_value
+
+    # Convert the final dictionary into a SimpleNamespace object for dot notation access (e.g., config.private_key)
+    return types.SimpleNamespace(**config_dict)
+
+
+def run_market_maker(metrics_server_port: int, condition_id: str):
     """
     Runs the market maker for a single condition_id.
     This function is the target for the multiprocessing.Process.
 
-    FIX: This function now accepts a 'config_obj' which is the already-parsed
-    configuration. It does NOT call get_args() again. It passes the config
-    directly to the App.
+    Only the metrics port and the condition_id are passed to the process, the
+    rest of the configuration is rebuilt here from the same defaults and
+    environment the runner read, so nothing else has to be pickled on spawn.
     """
     # A new process needs to have logging configured again.
     setup_logging()
-    from prometheus_client import start_http_server
     logger = logging.getLogger(__name__)
-    logging.basicConfig(level=logging.INFO)
-    logger.info(f"Starting market maker bot for condition_id: {condition_id}")
+    config_obj = load_config()
+    config_obj.metrics_server_port = metrics_server_port
+    logger.info("Starting market maker bot for condition_id: %s", condition_id)
     try:
-        from prometheus_client import start_http_server
         assert config_obj.metrics_server_port is not None, "Metrics server port must be set in the config object."
-        logger.info(f"Attempting to start metrics server on url http://localhost:{config_obj.metrics_server_port} for condition id {condition_id}...")
-        start_http_server(config_obj.metrics_server_port)
-        time.sleep(5)
-        logger.info(f"Metrics server started successfully for {condition_id}.")
+        logger.info("Attempting to start metrics server on url http://localhost:%s for condition id %s...", config_obj.metrics_server_port, condition_id)
+        start_metrics_server(config_obj.metrics_server_port)
+        logger.info("Metrics server started successfully for %s.", condition_id)
     except Exception as e:
 
         print("Failed to start metrics server:", e)
-        logger.error(f"CRITICAL: Failed to start metrics server for {condition_id} on port {config_obj.metrics_server_port}", exc_info=True)
+        logger.error("CRITICAL: Failed to start metrics server for %s on port %s", condition_id, config_obj.metrics_server_port, exc_info=True)
 
     try:
-        # The config_obj is passed directly to the App. No re-parsing!
+        # The config_obj is passed directly to the App.
         app = App(config_obj, condition_id)
         app.main()
     except KeyboardInterrupt:
-        logger.info(f"Process for {condition_id} received KeyboardInterrupt.")
+        logger.info("Process for %s received KeyboardInterrupt.", condition_id)
     except Exception:
-        logger.exception(f"An error occurred in the market maker bot for {condition_id}")
+        logger.exception("An error occurred in the market maker bot for %s", condition_id)
+
+def stop_bots(bots: dict, timeout: float = STOP_TIMEOUT):
+    """
+    Terminates the bot processes {condition_id: Process} together, they all share one timeout
+    before the ones still alive are killed.
+    """
+    logger = logging.getLogger(__name__)
+    for cid, process in bots.items():
+        logger.info("Stopping bot for %s...", cid)
+        process.terminate()
+    deadline = time.monotonic() + timeout
+    for process in bots.values():
+        process.join(max(0, deadline - time.monotonic()))
+    for cid, process in bots.items():
+        if process.is_alive():
+            logger.warning("Process for %s did not terminate gracefully. Killing.", cid)
+            process.kill()
+            process.join()
+        logger.info("Bot for %s stopped.", cid)
 
 if __name__ == "__main__":
     setup_logging()
     logger = logging.getLogger(__name__)
 
     # 4. Create the base configuration object from defaults and environment variables.
-    config_dict = DEFAULT_CONFIG.copy()
-    for key in config_dict:
-        env_value = os.environ.get(key.upper())
-        if env_value is not None:
-            config_dict[key] = env_value
-            
-    # Convert the final dictionary into a SimpleNamespace object for dot notation access (e.g., config.private_key)
-    base_config = types.SimpleNamespace(**config_dict)
+    base_config = load_config()
 
     # Create a single ClobApi instance for pre-flight checks
     try:
-        clob_api_for_checks = ClobApi(host=base_config.clob_api_url, chain_id=137, private_key=base_config.private_key)
+        clob_api_for_checks = ClobApi(host=base_config.clob_api_url, chain_id=137, private_key=base_config.private_key, warmup=True)
         collateral_address = clob_api_for_checks.get_collateral_address()
     except Exception as e:
         logger.error(f"Failed to initialize ClobApi for pre-flight checks. Cannot start bots. Error: {e}")
@@ -102,89 +127,101 @@ if __name__ == "__main__":
 
 
     running_bots = {}  # {condition_id: Process}
+    # forked bots inherit the loaded modules instead of re-importing them, as on spawn
+    mp_context = multiprocessing.get_context("spawn" if sys.platform == "win32" else "fork")
 
     try:
         logger.info("🚀 Starting Bot Runner...")
+        market_file_mtime = None
+        last_reconcile = 0
         while True:
+            try:
+                mtime = os.stat(MARKET_FILE).st_mtime_ns
+            except FileNotFoundError:
+                mtime = None
+            if mtime is not None and mtime == market_file_mtime and time.monotonic() - last_reconcile < RECONCILE_INTERVAL:
+                time.sleep(CHECK_INTERVAL)
+                continue
+            market_file_mtime = mtime
+            last_reconcile = time.monotonic()
+
+            # forget the bots that died, the reconcile below restarts them
+            for cid in [cid for cid, process in running_bots.items() if not process.is_alive()]:
+                process = running_bots.pop(cid)
+                process.join()
+                logger.warning("Bot for %s exited with code %s.", cid, process.exitcode)
+
             target_condition_ids = []
-            if os.path.exists(MARKET_FILE):
+            if mtime is not None:
                 try:
-                    with open(MARKET_FILE, 'r') as f:
-                        target_condition_ids = json.load(f)
-                except json.JSONDecodeError:
+                    with open(MARKET_FILE, 'rb') as f:
+                        target_condition_ids = orjson.loads(f.read())
+                except orjson.JSONDecodeError:
                     logger.warning(f"Could not decode JSON from {MARKET_FILE}. Skipping check.")
                     time.sleep(CHECK_INTERVAL)
                     continue
             else:
                 # For testing, if the file doesn't exist, let's create it with dummy data.
                 logger.info(f"{MARKET_FILE} not found. Creating a dummy file for demonstration.")
-                with open(MARKET_FILE, 'w') as f:
-                    json.dump(["market_a", "market_b", "market_c"], f)
+                write_json_atomic(MARKET_FILE, ["market_a", "market_b", "market_c"])
                 continue # Loop again to read the new file
 
-            target_set = set(target_condition_ids)
-            running_set = set(running_bots.keys())
+            # the metrics port offset of each market, looked up once per new bot
+            port_offsets = {cid: i for i, cid in enumerate(target_condition_ids)}
+            # key views support set operations, no copies of either side are made
+            target_set = port_offsets.keys()
 
             # --- Stop bots that are no longer in the target list ---
-            bots_to_stop = running_set - target_set
-            for cid in bots_to_stop:
-                logger.info(f"Stopping bot for {cid}...")
-                process = running_bots.pop(cid)
-                process.terminate()
-                process.join(timeout=10)
-                if process.is_alive():
-                    logger.warning(f"Process for {cid} did not terminate gracefully. Killing.")
-                    process.kill()
-                logger.info(f"Bot for {cid} stopped.")
+            bots_to_stop = running_bots.keys() - target_set
+            stop_bots({cid: running_bots.pop(cid) for cid in bots_to_stop})
 
             # --- Start new bots ---
-            bots_to_start = target_set - running_set
+            bots_to_start = target_set - running_bots.keys()
+            # --- PRE-FLIGHT CHECK ---
+            # resolve every new market first so all their prices come back in one concurrent batch
+            token_a_ids = {}
             for cid in bots_to_start:
-                # --- PRE-FLIGHT CHECK ---
                 try:
                     logger.info(f"Performing pre-flight check for market {cid}...")
-                    market = Market(cid, collateral_address)
-                    token_a_id = market.token_id(Token.A)
-                    price = clob_api_for_checks.get_price(token_a_id)
-
-                    if price is None or price <= 0.1 or price >= 0.9:
-                        logger.warning(f"SKIPPING bot for market {cid} due to price ({price}) being outside the 0.1-0.9 range.")
-                        continue # Skip starting this bot
-                    
-                    logger.info(f"Pre-flight check PASSED for market {cid} with price {price}.")
-
+                    token_a_ids[cid] = Market(cid, collateral_address).token_id(Token.A)
                 except Exception as e:
                     logger.error(f"Pre-flight check FAILED for market {cid}. Skipping bot. Error: {e}")
+            prices = clob_api_for_checks.get_prices(
+                [token_id for token_id in token_a_ids.values() if token_id is not None]
+            )
+
+            for cid in bots_to_start:
+                if cid not in token_a_ids:
                     continue
-                # --- END PRE-FLIGHT CHECK ---
+                price = prices.get(token_a_ids[cid])
 
-                # Create a deep copy of the config for the new process
-                process_config = copy.deepcopy(base_config)
+                if price is None or price <= 0.1 or price >= 0.9:
+                    logger.warning(f"SKIPPING bot for market {cid} due to price ({price}) being outside the 0.1-0.9 range.")
+                    continue # Skip starting this bot
+
+                logger.info(f"Pre-flight check PASSED for market {cid} with price {price}.")
+                # --- END PRE-FLIGHT CHECK ---
 
                 # Assign a unique metrics port
-                if cid in target_condition_ids:
-                    port_offset = target_condition_ids.index(cid)
-                    base_port = int(process_config.metrics_server_port)
-                    process_config.metrics_server_port = base_port + port_offset
-                
-                logger.info(f"Starting bot for {cid} on metrics port {process_config.metrics_server_port}")
-
-                p = multiprocessing.Process(
+                metrics_server_port = int(base_config.metrics_server_port)
+                if cid in port_offsets:
+                    metrics_server_port += port_offsets[cid]
+
+                logger.info(f"Starting bot for {cid} on metrics port {metrics_server_port}")
+
+                p = mp_context.Process(
                     target=run_market_maker,
-                    args=(process_config, cid) # Pass the final config object
+                    args=(metrics_server_port, cid) # the process rebuilds the rest of the config itself
                 )
                 p.start()
                 running_bots[cid] = p
 
-            logger.debug(f"Active bots: {len(running_bots)}. Target markets: {len(target_set)}.")
+            logger.debug("Active bots: %d. Target markets: %d.", len(running_bots), len(target_set))
             time.sleep(CHECK_INTERVAL)
 
     except KeyboardInterrupt:
         logger.info("\n🛑 Shutting down Bot Runner and all active bots...")
-        for cid, process in running_bots.items():
-            logger.info(f"Stopping bot for {cid}...")
-            process.terminate()
-            process.join(timeout=10)
+        stop_bots(running_bots)
         logger.info("All bots have been shut down.")
     except Exception:
         logger.exception("An unexpected error occurred in the Bot Runner main loop.")
@@ -1,25 +1,115 @@
 import logging
+import threading
 import numpy as np
 from datetime import datetime, timedelta
 from clob_api import ClobApi
+from utils import TTLCache
 
+try:
+    from numba import njit
+    _NUMBA_AVAILABLE = True
+except ImportError:
+    _NUMBA_AVAILABLE = False
 
 
-def get_token_score(token_id: int):
+logger = logging.getLogger(__name__)
+
+# scores are reused for half the market loop's hourly scoring interval,
+# and for longer if the market did not trade in the meantime
+SCORE_CACHE_TTL = 30 * 60
+SCORE_STALE_TTL = 6 * 60 * 60
+# tokens of markets that closed are dropped once stale, this bounds the rest
+SCORE_CACHE_MAXSIZE = 4096
+_score_cache = TTLCache(ttl=SCORE_CACHE_TTL, stale_ttl=SCORE_STALE_TTL, maxsize=SCORE_CACHE_MAXSIZE)
+# Gamma market fields that move whenever the market trades
+ACTIVITY_FIELDS = ("lastTradePrice", "bestBid", "bestAsk", "volume", "liquidity")
+
+
+_clob_api = None
+_clob_api_lock = threading.Lock()
+
+
+def _get_clob_api() -> ClobApi:
+    """
+    ClobApi shared by the scoring calls that are not given one, so they reuse its pooled connections
+    """
+    global _clob_api
+    with _clob_api_lock:
+        if _clob_api is None:
+            _clob_api = ClobApi()
+        return _clob_api
+
+
+def get_token_score(token_id: int, force_refresh: bool = False, clob_api: ClobApi = None):
     """
     Scores a token based on its spread, depth, and volume.
     Returns a score from 0 to 100.
     """
-    logger = logging.getLogger(__name__)
-    logger.level = logging.INFO
-    clob_api = ClobApi()
+    if token_id is None:
+        # nothing to request, scored like a missing order book
+        return score_token(token_id, None, None)
+    if not force_refresh:
+        score, is_fresh = _score_cache.get(token_id)
+        if is_fresh:
+            return score
+
+    clob_api = clob_api or _get_clob_api()
 
     # 1. Get data from the order book endpoint
     order_book = clob_api.get_book(token_id)
-    
+    price_history = clob_api.get_price_history(token_id) if _has_both_sides(order_book) else None
+    return _cache_score(token_id, order_book, score_token(token_id, order_book, price_history))
+
+
+def get_token_scores(token_ids: list, clob_api: ClobApi = None, force_refresh: bool = False, changed: set = None) -> dict:
+    """
+    get_token_score for many tokens, fetched concurrently. The price history of a token
+    is only requested once its order book turned out to be scorable.
+    If changed is given, only those tokens are fetched again, the others are served from the cache even when stale.
+    """
+    scores = {}
+    to_fetch = []
+    # a token listed twice is fetched once
+    for token_id in dict.fromkeys(token_ids):
+        if token_id is None:
+            scores[token_id] = score_token(token_id, None, None)
+            continue
+        if force_refresh or (changed is not None and token_id in changed):
+            score, is_fresh = None, False
+        else:
+            score, is_fresh = _score_cache.get(token_id)
+            is_fresh = is_fresh or (changed is not None and score is not None)
+        if is_fresh:
+            scores[token_id] = score
+        else:
+            to_fetch.append(token_id)
+    if not to_fetch:
+        return scores
+
+    clob_api = clob_api or _get_clob_api()
+    for token_id, (order_book, price_history) in clob_api.get_books_and_price_histories(to_fetch).items():
+        scores[token_id] = _cache_score(token_id, order_book, score_token(token_id, order_book, price_history))
+    return scores
+
+
+def _cache_score(token_id, order_book, score):
+    # a missing order book is usually a failed request, let the next call retry it
+    if order_book is not None:
+        _score_cache.set(token_id, score)
+    return score
+
+
+def _has_both_sides(order_book) -> bool:
+    return bool(order_book and order_book.get('bids') and order_book.get('asks'))
+
+
+def score_token(token_id: int, order_book, price_history):
+    """
+    Spread, depth, volatility and mid price of a token from its order book and price history
+    """
     # If essential data is missing, we can't score it.
-    if not order_book or not order_book.get('bids') or not order_book.get('asks') or len(order_book['bids']) == 0 or len(order_book['asks']) == 0:
-        logger.debug(f"Could not score token {token_id} due to empty or invalid order book.")
+    if not _has_both_sides(order_book):
+        logger.debug("Could not score token %s due to empty or invalid order book.", token_id)
         if not order_book:
             explanation = 0
         elif not order_book.get('bids'):
@@ -42,24 +132,177 @@ def get_token_score(token_id: int):
     depth_score = top_bids_size + top_asks_size
 
 
-    price_history = clob_api.get_price_history(token_id)
-    logger.debug(f"Fetched Price history {price_history}")
+    logger.debug("Fetched Price history %s", price_history)
     
     volatility_score = float('inf')
     if price_history:
-        prices = [item['p'] for item in price_history]
-        prices_array = np.array(prices)
-        log_returns = np.log(prices_array[1:] / prices_array[:-1])
-        volatility_score = np.std(log_returns)
+        prices = np.fromiter((item['p'] for item in price_history), dtype=np.float64, count=len(price_history))
+        # log(p[i+1] / p[i]) as a difference of logs, one temporary instead of three
+        volatility_score = float(np.diff(np.log(prices)).std())
 
 
 
 
-    logger.debug(f"Scored token {token_id}:  (Spread={spread_score:.2f}, Depth={depth_score:.2f},  Volatility={volatility_score:.2f})")
+    logger.debug("Scored token %s:  (Spread=%.2f, Depth=%.2f,  Volatility=%.2f)", token_id, spread_score, depth_score, volatility_score)
 
     return  spread_score, depth_score, volatility_score, price
 
 
+# columns of the raw score matrix, the first and last are better when lower
+SCORE_COLUMNS = ("spread", "depth", "volume", "volatility")
+_LOWER_IS_BETTER = np.array([True, False, False, True])
+_VOLATILITY_COLUMN = SCORE_COLUMNS.index("volatility")
+# a scoring pass' tokens, one row each
+TOKEN_SCORE_DTYPE = np.dtype([
+    ("spread", "f8"),
+    ("depth", "f8"),
+    ("volume", "f8"),
+    ("liquidity", "f8"),
+    ("volatility", "f8"),
+    ("price", "f8"),
+    ("score", "f8"),
+])
+
+
+def weighted_scores(raw: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """
+    Min-max normalizes each SCORE_COLUMNS column of the (N, 4) raw scores and returns
+    the weighted sum scaled to 100. Columns without any range normalize to 1.
+    """
+    if _NUMBA_AVAILABLE:
+        return _compiled_kernel(np.ascontiguousarray(raw, dtype=np.float64), weights.astype(np.float64), _LOWER_IS_BETTER)
+    return _weighted_scores_numpy(raw, weights)
+
+
+def _weighted_scores_numpy(raw: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    # the spread, depth and volume minimums ignore zeros, falling back to the plain minimum
+    mins = np.where(raw > 0, raw, np.inf).min(axis=0)
+    mins = np.where(np.isinf(mins), raw.min(axis=0), mins)
+    volatility_min = raw[:, 3].min()
+    mins[3] = volatility_min if volatility_min != 0 else 1e-10
+    maxs = np.where(np.isfinite(raw), raw, -np.inf).max(axis=0)
+
+    ranges = maxs - mins
+    has_range = ranges > 0
+    norm = np.where(has_range, (raw - mins) / np.where(has_range, ranges, 1.0), 1.0)
+    flip = _LOWER_IS_BETTER & has_range
+    norm[:, flip] = 1 - norm[:, flip]
+
+    return 100 * (norm @ weights)
+
+
+def _weighted_scores_kernel(raw, weights, lower_is_better):
+    """
+    weighted_scores as scalar loops, compiled by numba when it is installed
+    """
+    n, m = raw.shape
+    mins = np.empty(m)
+    maxs = np.empty(m)
+    for j in range(m):
+        low = np.inf
+        positive_low = np.inf
+        high = -np.inf
+        for i in range(n):
+            value = raw[i, j]
+            if value < low:
+                low = value
+            if value > 0 and value < positive_low:
+                positive_low = value
+            if np.isfinite(value) and value > high:
+                high = value
+        if j == _VOLATILITY_COLUMN:
+            mins[j] = low if low != 0 else 1e-10
+        else:
+            mins[j] = positive_low if positive_low != np.inf else low
+        maxs[j] = high
+
+    scores = np.empty(n)
+    for i in range(n):
+        total = 0.0
+        for j in range(m):
+            value_range = maxs[j] - mins[j]
+            norm = 1.0
+            if value_range > 0:
+                norm = (raw[i, j] - mins[j]) / value_range
+                if lower_is_better[j]:
+                    norm = 1 - norm
+            total += norm * weights[j]
+        scores[i] = 100 * total
+    return scores
+
+
+if _NUMBA_AVAILABLE:
+    _compiled_kernel = njit(cache=True)(_weighted_scores_kernel)
+
+
+class WeightedScorer:
+    """
+    weighted_scores that keeps the last result, so an unchanged token universe with unchanged
+    raw scores is not normalized again
+    """
+
+    def __init__(self, weights: np.ndarray):
+        self.weights = weights
+        self._token_ids = None
+        self._raw = None
+        self._scores = None
+        if _NUMBA_AVAILABLE:
+            # compile the kernel now rather than in the first scoring pass
+            weighted_scores(np.ones((1, len(SCORE_COLUMNS))), weights)
+
+    def scores(self, token_ids: tuple, raw: np.ndarray) -> np.ndarray:
+        if token_ids != self._token_ids or not np.array_equal(raw, self._raw):
+            self._token_ids = token_ids
+            self._raw = raw
+            self._scores = weighted_scores(raw, self.weights)
+        return self._scores
+
+
+class MarketActivity:
+    """
+    Remembers the ACTIVITY_FIELDS of the markets at the last scoring pass,
+    so only the markets that traded since then need to be scored again
+    """
+
+    def __init__(self):
+        self._scored = None
+
+    def changed(self, markets: dict) -> set:
+        """
+        Condition IDs of the markets that are new or traded since the last scoring pass
+        """
+        scored = self._scored or {}
+        return {
+            condition_id
+            for condition_id, market in markets.items()
+            if scored.get(condition_id) != _activity(market)
+        }
+
+    def unchanged(self, markets: dict) -> bool:
+        """
+        Whether the last scoring pass saw exactly these markets in the same state
+        """
+        return self._scored is not None and self._scored.keys() == markets.keys() and not self.changed(markets)
+
+    def mark_scored(self, markets: dict):
+        self._scored = {condition_id: _activity(market) for condition_id, market in markets.items()}
+
+
+def _activity(market: dict) -> tuple:
+    return tuple(market.get(field) for field in ACTIVITY_FIELDS)
+
+
+def top_n_indices(scores: np.ndarray, n: int) -> np.ndarray:
+    """
+    Indices of the n highest scores, best first. Partitions instead of sorting all of them.
+    """
+    n = min(n, len(scores))
+    if n == 0:
+        return np.array([], dtype=np.intp)
+    top = np.argpartition(-scores, n - 1)[:n]
+    return top[np.argsort(-scores[top], kind="stable")]
+
+
 if __name__ == "__main__":
     logging.basicConfig(level=logging.DEBUG)
     token_id_to_test = 115110300459694805744035858549696192321864942474801224215254976811205215560373
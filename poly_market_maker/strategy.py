@@ -1,6 +1,7 @@
 from enum import Enum
 import json
 import logging
+import time
 
 from orderbook import OrderBookManager
 from price_feed import PriceFeed
@@ -11,6 +12,9 @@ from strategies.base_strategy import BaseStrategy
 from strategies.amm_strategy import AMMStrategy
 from strategies.bands_strategy import BandsStrategy
 
+# synchronize at least this often (in seconds) even if nothing changed
+FORCE_SYNC_INTERVAL = 30
+
 
 class Strategy(Enum):
     AMM = "amm"
@@ -41,6 +45,8 @@ class StrategyManager:
 
         self.price_feed = price_feed
         self.order_book_manager = order_book_manager
+        self._last_sync_key = None
+        self._last_sync_time = 0
 
         match Strategy(strategy):
             case Strategy.AMM:
@@ -62,30 +68,60 @@ class StrategyManager:
             return
 
         token_prices = self.get_token_prices()
-        self.logger.debug(f"{token_prices}")
+        self.logger.debug("%s", token_prices)
 
         if token_prices[Token.A] == -1:
             self.logger.warning("Invalid token price. Not placing new orders.")
             return
 
+        sync_key = self._sync_key(orderbook, token_prices)
+        now = time.monotonic()
+        if (
+            sync_key == self._last_sync_key
+            and now - self._last_sync_time < FORCE_SYNC_INTERVAL
+        ):
+            self.logger.debug("Orders, balances and prices unchanged, skipping sync")
+            return
+        self._last_sync_key = sync_key
+        self._last_sync_time = now
+
         (orders_to_cancel, orders_to_place) = self.strategy.get_orders(
             orderbook, token_prices
         )
 
-        self.logger.debug(f"order to cancel: {len(orders_to_cancel)}")
-        self.logger.debug(f"order to place: {len(orders_to_place)}")
+        self.logger.debug("order to cancel: %d", len(orders_to_cancel))
+        self.logger.debug("order to place: %d", len(orders_to_place))
 
         self.cancel_orders(orders_to_cancel)
         self.place_orders(orders_to_place)
 
         self.logger.debug("Synchronized strategy!")
 
+    @staticmethod
+    def _sync_key(orderbook, token_prices: dict) -> tuple:
+        """
+        Snapshot of everything the strategy decision depends on
+        """
+        return (
+            tuple(
+                sorted(
+                    (order.id, order.size, order.price)
+                    for order in orderbook.orders
+                    if order.id
+                )
+            ),
+            tuple(orderbook.balances.items()),
+            tuple(token_prices.items()),
+            orderbook.orders_being_placed,
+            orderbook.orders_being_cancelled,
+        )
+
     def get_order_book(self):
         self.logger.setLevel(logging.DEBUG)
         orderbook = self.order_book_manager.get_order_book()
         print(f" The orderbook is {orderbook} ")
-        self.logger.debug(f"Orderbook: {orderbook.balances}")
-        self.logger.debug(f"Orderbook: {orderbook.orders}")
+        self.logger.debug("Orderbook: %s", orderbook.balances)
+        self.logger.debug("Orderbook: %s", orderbook.orders)
 
         if None in orderbook.balances.values():
             self.logger.debug("Balances invalid/non-existent")
@@ -1,7 +1,11 @@
 import logging
 import math
+import orjson
 import os
 import random
+import threading
+import time
+from collections import OrderedDict
 import yaml
 from logging import config
 from web3 import Web3
@@ -66,19 +70,23 @@ def setup_web3(rpc_url, private_key):
 
 
 def math_round_down(f: float, sig_digits: int) -> float:
-    str_f = str(f).split(".")
-    if len(str_f) > 1 and len(str_f[1]) == sig_digits:
-        # don't round values which are already the number of sig_digits
-        return f
-    return math.floor((f * (10**sig_digits))) / (10**sig_digits)
+    scale = 10**sig_digits
+    scaled = f * scale
+    nearest = round(scaled)
+    if math.isclose(scaled, nearest, rel_tol=1e-12):
+        # don't round values which are already the number of sig_digits, they only miss it by a few ulps
+        return nearest / scale
+    return math.floor(scaled) / scale
 
 
 def math_round_up(f: float, sig_digits: int) -> float:
-    str_f = str(f).split(".")
-    if len(str_f) > 1 and len(str_f[1]) == sig_digits:
-        # don't round values which are already the number of sig_digits
-        return f
-    return math.ceil((f * (10**sig_digits))) / (10**sig_digits)
+    scale = 10**sig_digits
+    scaled = f * scale
+    nearest = round(scaled)
+    if math.isclose(scaled, nearest, rel_tol=1e-12):
+        # don't round values which are already the number of sig_digits, they only miss it by a few ulps
+        return nearest / scale
+    return math.ceil(scaled) / scale
 
 
 def add_randomness(price: float, lower: float, upper: float) -> float:
@@ -86,4 +94,79 @@ def add_randomness(price: float, lower: float, upper: float) -> float:
 
 
 def randomize_default_price(price: float) -> float:
-    return add_randomness(price, -0.1, 0.1)
\ No newline at end of file
+    return add_randomness(price, -0.1, 0.1)
+
+
+def write_json_atomic(path: str, data, indent: bool = False):
+    """
+    Writes data as JSON to path, readers only ever see the old or the complete new file
+    """
+    # per process, so two writers never share a temp file
+    temp_path = f"{path}.tmp.{os.getpid()}"
+    fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        try:
+            os.write(fd, orjson.dumps(data, option=orjson.OPT_INDENT_2 if indent else 0))
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+class TTLCache:
+    """
+    Thread safe key/value cache.
+    Entries are fresh for `ttl` seconds and can still be served as stale until `stale_ttl` seconds.
+    Holds at most `maxsize` entries, the oldest are dropped first.
+    """
+
+    def __init__(self, ttl: float, stale_ttl: float = None, maxsize: int = 10_000):
+        assert ttl > 0
+        assert stale_ttl is None or stale_ttl >= ttl
+        assert maxsize > 0
+
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl if stale_ttl is not None else ttl
+        self.maxsize = maxsize
+        # oldest first, set() moves a key to the end
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key) -> tuple:
+        """
+        Returns (value, is_fresh). Value is None if the key is missing or fully expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None, False
+
+            value, stored_at = entry
+            age = time.monotonic() - stored_at
+            if age > self.stale_ttl:
+                del self._entries[key]
+                return None, False
+        return value, age <= self.ttl
+
+    def set(self, key, value):
+        now = time.monotonic()
+        with self._lock:
+            entries = self._entries
+            entries[key] = (value, now)
+            entries.move_to_end(key)
+            # expired entries are only ever at the front, drop them along with any over maxsize
+            while len(entries) > self.maxsize or now - next(iter(entries.values()))[1] > self.stale_ttl:
+                entries.popitem(last=False)
+
+    def invalidate(self, key=None):
+        """
+        Drops key from the cache, or every entry if no key is given
+        """
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
@@ -0,0 +1,365 @@
+import json
+import os
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import TestCase
+from unittest.mock import patch
+
+from aiohttp import web
+from prometheus_client import REGISTRY
+
+import clob_api
+from clob_api import ClobApi, MAX_URL_LENGTH, _chunk_condition_ids, _get_async_http
+
+
+class FakeResponse:
+    def __init__(self, data, status_code=200):
+        self.data = data
+        self.status_code = status_code
+        self.text = json.dumps(data)
+        self.content = self.text.encode()
+
+    def json(self):
+        return self.data
+
+
+class FakeSession:
+    """Answers Gamma queries from a list of markets, applying the status filters"""
+
+    def __init__(self, markets):
+        self.markets = markets
+        self.calls = []
+        self.status_code = 200
+
+    def get(self, url, params=None, **kwargs):
+        self.calls.append(params)
+        condition_ids = set(params.get("condition_ids", []))
+        data = [
+            market
+            for market in self.markets
+            if market["condition_id"] in condition_ids
+            and all(
+                market[key] == value
+                for key, value in params.items()
+                if key in ("active", "closed", "accepting_orders")
+            )
+        ]
+        return FakeResponse(data, self.status_code)
+
+
+def market(condition_id, active=True, closed=False, accepting_orders=True):
+    return {
+        "condition_id": condition_id,
+        "active": active,
+        "closed": closed,
+        "accepting_orders": accepting_orders,
+    }
+
+
+class TestClobApi(TestCase):
+    def setUp(self):
+        self.clob_api = ClobApi()
+        self.clob_api._session = FakeSession(
+            [
+                market("0x01"),
+                market("0x02", active=False),
+                market("0x03", closed=True),
+                market("0x04", accepting_orders=False),
+            ]
+        )
+
+    def test_get_to_delete(self):
+        to_delete = self.clob_api.get_to_delete(["0x01", "0x02", "0x03", "0x04"])
+
+        self.assertEqual(to_delete, {"0x02", "0x03", "0x04"})
+
+    def test_get_to_delete_single_query_per_chunk(self):
+        self.clob_api.get_to_delete(["0x01", "0x02", "0x03", "0x04"])
+
+        self.assertEqual(self.clob_api._session.calls, [{"condition_ids": ["0x01", "0x02", "0x03", "0x04"]}])
+
+    def test_get_to_delete_legacy(self):
+        session = self.clob_api._session
+        self.clob_api = ClobApi(_legacy=True)
+        self.clob_api._session = session
+
+        to_delete = self.clob_api.get_to_delete(["0x01", "0x02", "0x03", "0x04"])
+
+        self.assertEqual(to_delete, {"0x02", "0x03", "0x04"})
+        self.assertEqual(len(session.calls), 3)
+
+    def test_get_to_delete_cached(self):
+        self.clob_api.get_to_delete(["0x01", "0x02"])
+        to_delete = self.clob_api.get_to_delete(["0x02", "0x01", "0x03"])
+
+        self.assertEqual(to_delete, {"0x02", "0x03"})
+        self.assertEqual(
+            self.clob_api._session.calls,
+            [{"condition_ids": ["0x01", "0x02"]}, {"condition_ids": ["0x03"]}],
+        )
+
+        self.clob_api.get_to_delete(["0x01"], force_refresh=True)
+        self.assertEqual(len(self.clob_api._session.calls), 3)
+
+    def test_get_to_delete_failed_query_not_cached(self):
+        self.clob_api._session.status_code = 500
+        self.assertEqual(self.clob_api.get_to_delete(["0x02"]), set())
+
+        self.clob_api._session.status_code = 200
+        self.assertEqual(self.clob_api.get_to_delete(["0x02"]), {"0x02"})
+
+    def test_get_to_delete_empty(self):
+        self.assertEqual(self.clob_api.get_to_delete([]), set())
+
+
+class TestGetVolumeAndLiquidity(TestCase):
+    def test_get_volume_and_liquidity(self):
+        clob_api = ClobApi()
+        clob_api._session = FakeSession(
+            [
+                {**market("0x01"), "conditionId": "0x01", "volumeNum": 10, "liquidityNum": 20},
+                {**market("0x02"), "conditionId": "0x02", "volumeNum": 30},
+            ]
+        )
+
+        volume, liquidity = clob_api.get_volume_and_liquidity(["0x01", "0x02"])
+
+        self.assertEqual(volume, {"0x01": 10, "0x02": 30})
+        self.assertEqual(liquidity, {"0x01": 20, "0x02": 0})
+
+        volume, liquidity = clob_api.get_volume_and_liquidity(["0x02", "0x03"])
+
+        self.assertEqual(volume, {"0x02": 30})
+        self.assertEqual(clob_api._session.calls[-1]["condition_ids"], ["0x03"])
+        clob_api.get_volume_and_liquidity(["0x03"])
+        self.assertEqual(len(clob_api._session.calls), 2)
+
+    def test_get_volume_and_liquidity_chunked(self):
+        condition_ids = ["0x%064x" % i for i in range(100)]
+        clob_api = ClobApi()
+        clob_api._session = FakeSession(
+            [{**market(cid), "conditionId": cid, "volumeNum": i} for i, cid in enumerate(condition_ids)]
+        )
+
+        volume, liquidity = clob_api.get_volume_and_liquidity(condition_ids)
+
+        self.assertEqual(volume, {cid: i for i, cid in enumerate(condition_ids)})
+        self.assertEqual(len(liquidity), 100)
+        self.assertGreater(len(clob_api._session.calls), 1)
+        self.assertEqual(
+            sorted(sum((call["condition_ids"] for call in clob_api._session.calls), [])),
+            condition_ids,
+        )
+
+
+class TestChunkConditionIds(TestCase):
+    def test_chunks_fit_url_length(self):
+        condition_ids = ["0x%064x" % i for i in range(100)]
+        overhead = len("https://gamma-api.polymarket.com/markets") + 1
+
+        chunks = _chunk_condition_ids(condition_ids, overhead)
+
+        self.assertEqual(sum(chunks, []), condition_ids)
+        for chunk in chunks:
+            query = urllib.parse.urlencode({"condition_ids": chunk}, doseq=True)
+            self.assertLessEqual(overhead + len(query), MAX_URL_LENGTH)
+        for chunk, next_chunk in zip(chunks, chunks[1:]):
+            query = urllib.parse.urlencode({"condition_ids": chunk + next_chunk[:1]}, doseq=True)
+            self.assertGreater(overhead + len(query), MAX_URL_LENGTH)
+
+    def test_empty(self):
+        self.assertEqual(_chunk_condition_ids([], 0), [])
+
+
+class TestClobApiAsync(TestCase):
+    """Fans requests out against a local CLOB stand-in running on the background loop"""
+
+    @classmethod
+    def setUpClass(cls):
+        async def book(request):
+            token_id = request.query["token_id"]
+            if token_id == "404":
+                raise web.HTTPNotFound()
+            if token_id == "7":
+                level = [{"price": "0.5", "size": "10"}]
+                return web.json_response({"asset_id": token_id, "bids": level, "asks": level})
+            return web.json_response({"asset_id": token_id, "bids": [], "asks": []})
+
+        async def midpoint(request):
+            return web.json_response({"mid": "0.4" if request.query["token_id"] == "1" else "0.6"})
+
+        async def price(request):
+            return web.json_response({"price": "0.55", "side": request.query["side"]})
+
+        async def prices_history(request):
+            return web.json_response({"history": [{"t": 1, "p": 0.5}]})
+
+        async def start():
+            app = web.Application()
+            app.router.add_get("/book", book)
+            app.router.add_get("/midpoint", midpoint)
+            app.router.add_get("/price", price)
+            app.router.add_get("/prices-history", prices_history)
+            runner = web.AppRunner(app)
+            await runner.setup()
+            site = web.TCPSite(runner, "127.0.0.1", 0)
+            await site.start()
+            return runner, site._server.sockets[0].getsockname()[1]
+
+        cls.runner, port = _get_async_http().run(start())
+        cls.clob_api = ClobApi(host=f"http://127.0.0.1:{port}")
+
+    @classmethod
+    def tearDownClass(cls):
+        _get_async_http().run(cls.runner.cleanup())
+
+    def test_get_books_and_price_histories(self):
+        fetched = self.clob_api.get_books_and_price_histories([1, 7, 404])
+
+        self.assertEqual(fetched[1], ({"asset_id": "1", "bids": [], "asks": []}, None))
+        self.assertEqual(fetched[7][0]["asset_id"], "7")
+        self.assertEqual(fetched[7][1], [{"t": 1, "p": 0.5}])
+        self.assertEqual(fetched[404], (None, None))
+
+    def test_sync_reads_use_host(self):
+        self.assertEqual(self.clob_api.get_book(1)["asset_id"], "1")
+        self.assertEqual(self.clob_api.get_price_history(1), [{"t": 1, "p": 0.5}])
+
+    def test_get_prices(self):
+        self.assertEqual(self.clob_api.get_prices([1, 2]), {1: 0.4, 2: 0.6})
+        self.assertEqual(self.clob_api.get_prices([1], side="BUY"), {1: 0.55})
+
+    def test_get_prices_empty(self):
+        self.assertEqual(self.clob_api.get_prices([]), {})
+
+
+class TestAsyncHttpFork(TestCase):
+    def test_forked_child_starts_its_own_loop(self):
+        _get_async_http()
+
+        pid = os.fork()
+        if pid == 0:
+            os._exit(0 if clob_api._async_http is None else 1)
+        _, status = os.waitpid(pid, 0)
+
+        self.assertEqual(os.waitstatus_to_exitcode(status), 0)
+        self.assertIsNotNone(clob_api._async_http)
+
+
+class FakeClient:
+    def __init__(self):
+        self.calls = 0
+
+    def get_collateral_address(self):
+        self.calls += 1
+        return "0xcollateral"
+
+    def get_exchange_address(self, neg_risk=False):
+        self.calls += 1
+        return "0xnegrisk" if neg_risk else "0xexchange"
+
+
+class TestClobApiAddresses(TestCase):
+    def setUp(self):
+        self.clob_api = ClobApi()
+        self.clob_api.client = FakeClient()
+
+    def test_addresses_fetched_once(self):
+        self.assertEqual(self.clob_api.get_collateral_address(), "0xcollateral")
+        self.assertEqual(self.clob_api.get_collateral_address(), "0xcollateral")
+        self.assertEqual(self.clob_api.get_exchange(), "0xexchange")
+        self.assertEqual(self.clob_api.get_exchange(neg_risk=True), "0xnegrisk")
+        self.assertEqual(self.clob_api.get_exchange(), "0xexchange")
+        self.assertEqual(self.clob_api.client.calls, 3)
+
+
+class HeadSession:
+    def __init__(self):
+        self.heads = []
+        self.done = threading.Event()
+
+    def head(self, url, **kwargs):
+        self.heads.append(url)
+        if len(self.heads) == 2:
+            self.done.set()
+        raise ConnectionError("offline")
+
+
+class TestClobApiWarmup(TestCase):
+    def test_warmup_heads_both_hosts(self):
+        session = HeadSession()
+        with patch.object(clob_api, "_new_session", return_value=session):
+            ClobApi(warmup=True)
+
+        self.assertTrue(session.done.wait(5))
+        self.assertEqual(
+            session.heads,
+            ["https://clob.polymarket.com/ok", "https://gamma-api.polymarket.com/markets"],
+        )
+
+    def test_no_warmup_by_default(self):
+        session = HeadSession()
+        with patch.object(clob_api, "_new_session", return_value=session):
+            ClobApi()
+
+        self.assertEqual(session.heads, [])
+
+
+class FailingClient:
+    def create_and_post_order(self, order_args):
+        return {"success": False, "errorMsg": "not enough balance"}
+
+
+class TestClobApiLatency(TestCase):
+    def count(self, status):
+        return REGISTRY.get_sample_value(
+            "market_maker_clob_requests_latency_count",
+            {"method": "create_and_post_order", "status": status},
+        ) or 0
+
+    def test_rejected_order_observed_once(self):
+        clob_api = ClobApi()
+        clob_api.client = FailingClient()
+        ok, error = self.count("ok"), self.count("error")
+
+        with self.assertRaises(Exception):
+            clob_api.place_order(0.5, 10, "BUY", 1)
+
+        self.assertEqual(self.count("ok"), ok)
+        self.assertEqual(self.count("error"), error + 1)
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = b"[]"
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestConnectionReuse(TestCase):
+    def count(self, name):
+        return REGISTRY.get_sample_value(f"market_maker_{name}_total") or 0
+
+    def test_second_request_reuses_connection(self):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        session = clob_api._new_session()
+        self.addCleanup(session.close)
+        url = f"http://127.0.0.1:{server.server_port}/"
+        new, reused = self.count("clob_http_conn_new"), self.count("clob_http_conn_reused")
+
+        session.get(url)
+        session.get(url)
+
+        self.assertEqual(self.count("clob_http_conn_new"), new + 1)
+        self.assertEqual(self.count("clob_http_conn_reused"), reused + 1)
@@ -0,0 +1,57 @@
+from unittest import TestCase
+from web3 import Web3
+
+from contracts import Contracts, Multicall3, erc1155_balance_of
+
+address = "0x2E8DCfE708D44ae2e406a1c02DFE2Fa13012f961"
+padded_address = "0000000000000000000000002e8dcfe708d44ae2e406a1c02dfe2fa13012f961"
+
+
+class TestContracts(TestCase):
+    w3 = Web3()
+    contracts = Contracts(w3, None)
+    multicall = Multicall3(w3)
+
+    def test_encode_erc20_balance_of(self):
+        self.assertEqual(
+            self.contracts.encode_balance_of(address, address).hex(),
+            "70a08231" + padded_address,
+        )
+
+    def test_encode_erc1155_balance_of(self):
+        self.assertEqual(
+            self.contracts.encode_balance_of(address, address, 5).hex(),
+            "00fdd58e" + padded_address + (5).to_bytes(32, "big").hex(),
+        )
+
+    def test_encode_get_eth_balance(self):
+        self.assertEqual(
+            self.multicall.encode_get_eth_balance(address).hex(),
+            "4d2301cc" + padded_address,
+        )
+
+    def test_encode_balance_of_matches_abi_encoding(self):
+        erc1155 = self.w3.eth.contract(address, abi=erc1155_balance_of)
+        self.assertEqual(
+            "0x" + self.contracts.encode_balance_of(address, address, 2**255 + 1).hex(),
+            erc1155.encode_abi("balanceOf", args=[address, 2**255 + 1]),
+        )
+
+    def test_decode_uint256(self):
+        self.assertEqual(Multicall3.decode_uint256((10**6).to_bytes(32, "big")), 10**6)
+
+    def test_encode_allowance(self):
+        self.assertEqual(
+            self.contracts.encode_allowance(address, address, address),
+            "0xdd62ed3e" + padded_address + padded_address,
+        )
+
+    def test_encode_is_approved_for_all(self):
+        self.assertEqual(
+            self.contracts.encode_is_approved_for_all(address, address, address),
+            "0xe985e9c5" + padded_address + padded_address,
+        )
+
+    def test_decode_bool(self):
+        self.assertTrue(Multicall3.decode_bool((1).to_bytes(32, "big")))
+        self.assertFalse(Multicall3.decode_bool((0).to_bytes(32, "big")))
@@ -1,6 +1,11 @@
+import json
+import os
+import tempfile
 from unittest import TestCase
+from unittest.mock import patch
 from web3 import Web3
 
+import ct_helpers
 from ct_helpers import CTHelpers
 
 
@@ -72,3 +77,41 @@ class TestCTHelpers(TestCase):
         self.assertEqual(
             CTHelpers.get_token_id(condition_id), token_id_1
         )
+
+
+class TestCTHelpersTokenIds(TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix=".json")
+        os.close(fd)
+        self.write({"0x01": [1, 2]})
+        patcher = patch.object(ct_helpers, "TOKEN_ID_FILE", self.path)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(os.remove, self.path)
+        self.addCleanup(CTHelpers.invalidate)
+        CTHelpers.invalidate()
+
+    def write(self, token_ids):
+        with open(self.path, "w") as f:
+            json.dump(token_ids, f)
+
+    def test_get_token_ids_is_cached(self):
+        self.assertEqual(CTHelpers.get_token_ids("0x01"), [1, 2])
+        with patch.object(ct_helpers.json, "load") as load:
+            self.assertEqual(CTHelpers.get_token_ids("0x01"), [1, 2])
+        load.assert_not_called()
+
+    def test_get_token_ids_reloads_on_change(self):
+        self.assertEqual(CTHelpers.get_token_ids("0x01"), [1, 2])
+        self.write({"0x01": [1, 2], "0x02": [5, 6]})
+        stat = os.stat(self.path)
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+
+        self.assertEqual(CTHelpers.get_token_ids("0x02"), [5, 6])
+        self.assertIsNone(CTHelpers.get_token_ids("0x03"))
+
+    def test_invalidate(self):
+        self.assertEqual(CTHelpers.get_token_ids("0x01"), [1, 2])
+        CTHelpers.invalidate()
+        with patch.object(ct_helpers.json, "load", return_value={"0x01": [3, 4]}):
+            self.assertEqual(CTHelpers.get_token_ids("0x01"), [3, 4])
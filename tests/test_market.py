@@ -1,5 +1,7 @@
 from unittest import TestCase
+from unittest.mock import patch
 
+from ct_helpers import CTHelpers
 from market import Market, Token
 
 usdc_address = "0x2E8DCfE708D44ae2e406a1c02DFE2Fa13012f961"
@@ -25,3 +27,17 @@ class TestMarket(TestCase):
         self.assertEqual(self.market.token(token_id_1), Token.B)
 
         self.assertRaises(ValueError, self.market.token, 0)
+
+
+class TestMarketTokenLookup(TestCase):
+    def test_token_ids_from_file_strings(self):
+        with patch.object(
+            CTHelpers, "get_token_ids", return_value=[str(token_id_0), str(token_id_1)]
+        ):
+            market = Market(condition_id, usdc_address)
+
+        self.assertEqual(market.token_id(Token.A), token_id_0)
+        self.assertEqual(market.token(token_id_0), Token.A)
+        self.assertEqual(market.token(token_id_1), Token.B)
+        self.assertIsNone(market.token(None))
+        self.assertRaises(ValueError, market.token, 0)
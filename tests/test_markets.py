@@ -0,0 +1,89 @@
+from datetime import datetime, timedelta, timezone
+from unittest import TestCase
+from unittest.mock import patch
+
+import orjson
+
+import markets
+from markets import is_end_date_valid, keep_token_order
+
+now = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+class TestIsEndDateValid(TestCase):
+    def test_no_end_date(self):
+        self.assertTrue(is_end_date_valid(None, now))
+
+    def test_end_date(self):
+        self.assertTrue(is_end_date_valid("2025-01-08T00:00:00Z", now))
+        self.assertFalse(is_end_date_valid("2025-01-07T23:59:59Z", now))
+        self.assertFalse(is_end_date_valid("2025-01-08T00:00:00Z", now + timedelta(seconds=1)))
+
+    def test_invalid_end_date(self):
+        self.assertFalse(is_end_date_valid("soon", now))
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.content = orjson.dumps(data)
+
+    def raise_for_status(self):
+        pass
+
+
+class TestGetPolymarketSportsMarkets(TestCase):
+    def test_keeps_only_market_fields(self):
+        market = {
+            "id": "1",
+            "question": "Will it rain?",
+            "active": True,
+            "closed": False,
+            "enableOrderBook": True,
+            "outcomePrices": '["0.5", "0.5"]',
+            "clobTokenIds": '["11", "12"]',
+            "volume": "1000",
+            "description": "A long description",
+        }
+
+        with patch.object(markets._session, "get", return_value=FakeResponse([market, "error"])):
+            fetched = markets.get_polymarket_sports_markets()
+
+        self.assertEqual(list(fetched), ["1"])
+        self.assertEqual(fetched["1"]["clobTokenIds"], ["11", "12"])
+        self.assertEqual(fetched["1"]["volume"], "1000")
+        self.assertTrue(fetched["1"]["active"])
+        self.assertFalse(fetched["1"]["closed"])
+        self.assertNotIn("description", fetched["1"])
+
+    def test_filters_markets(self):
+        def market(id, **fields):
+            return {
+                "id": id,
+                "active": True,
+                "closed": False,
+                "enableOrderBook": True,
+                "outcomePrices": '["0.5", "0.5"]',
+                **fields,
+            }
+
+        data = [
+            market("1"),
+            market("2", active=False),
+            market("3", closed=True),
+            market("4", outcomePrices='["0.05", "0.95"]'),
+            market("5", end_date="2000-01-01T00:00:00Z"),
+        ]
+        with patch.object(markets._session, "get", return_value=FakeResponse(data)):
+            self.assertEqual(list(markets.get_polymarket_sports_markets()), ["1"])
+
+
+class TestKeepTokenOrder(TestCase):
+    def test_known_markets_keep_their_order(self):
+        grouped = {"0x01": ["11", "12"], "0x02": ["21", "22"], "0x03": ["31", "32"]}
+        token_order = {"0x01": ["12", "11"], "0x03": ["31", "39"]}
+
+        self.assertEqual(
+            keep_token_order(grouped, token_order),
+            # "0x03" lists other tokens than before, it takes the new ones in their order
+            {"0x01": ["12", "11"], "0x02": ["21", "22"], "0x03": ["31", "32"]},
+        )
@@ -0,0 +1,34 @@
+import gzip
+from unittest import TestCase
+
+from prometheus_client import CollectorRegistry, Counter
+
+from metrics import make_cached_metrics_app
+
+
+class TestCachedMetricsApp(TestCase):
+    def setUp(self):
+        self.registry = CollectorRegistry()
+        self.counter = Counter("scrapes", "Test counter", registry=self.registry)
+        self.headers = None
+
+    def start_response(self, status, headers):
+        self.headers = dict(headers)
+
+    def test_output_is_cached(self):
+        app = make_cached_metrics_app(self.registry, cache_ttl=60)
+
+        first = b"".join(app({}, self.start_response))
+        self.counter.inc()
+        second = b"".join(app({}, self.start_response))
+
+        self.assertIn(b"scrapes_total 0.0", first)
+        self.assertEqual(first, second)
+
+    def test_gzip(self):
+        app = make_cached_metrics_app(self.registry, cache_ttl=0)
+
+        body = b"".join(app({"HTTP_ACCEPT_ENCODING": "gzip"}, self.start_response))
+
+        self.assertEqual(self.headers["Content-Encoding"], "gzip")
+        self.assertIn(b"scrapes_total", gzip.decompress(body))
@@ -0,0 +1,35 @@
+from unittest import TestCase
+
+from portfolio import PortfolioBook
+from token_class import Token, Collateral
+
+
+class TestPortfolioBook(TestCase):
+    def test_pnl_single_market(self):
+        book = PortfolioBook()
+        book.update(
+            0,
+            {Collateral: 100.0, Token.A: 0.0, Token.B: 0.0},
+            {Collateral: 90.0, Token.A: 10.0, Token.B: 5.0},
+            0.6,
+        )
+
+        # -10 collateral + 10 * 0.6 + 5 * 0.4
+        self.assertAlmostEqual(book.pnl(), -2.0)
+
+    def test_pnl_many_markets(self):
+        book = PortfolioBook(2)
+        book.update(
+            0,
+            {Collateral: 100.0, Token.A: 0.0, Token.B: 0.0},
+            {Collateral: 95.0, Token.A: 10.0, Token.B: 0.0},
+            0.5,
+        )
+        book.update(
+            1,
+            {Collateral: 50.0, Token.A: 0.0, Token.B: 0.0},
+            {Collateral: 48.0, Token.A: 0.0, Token.B: 4.0},
+            0.25,
+        )
+
+        self.assertAlmostEqual(book.pnl(), 0.0 + 1.0)
@@ -0,0 +1,227 @@
+import time
+from unittest import TestCase
+
+import numpy as np
+
+import scoring
+
+from scoring import MarketActivity, WeightedScorer, get_token_score, get_token_scores, score_token, top_n_indices, weighted_scores
+
+weights = np.array([0.35, 0.25, 0.5, -0.15])
+
+
+def loop_scores(rows):
+    """The per-token normalization the market loop used to run"""
+    spreads, depths, volumes, volatilities = zip(*rows)
+    min_spread = min(s for s in spreads if s > 0)
+    max_spread = max(spreads)
+    min_depth = min(d for d in depths if d > 0)
+    max_depth = max(depths)
+    min_volume = min(v for v in volumes if v > 0)
+    max_volume = max(volumes)
+    min_volatility = min(volatilities) or 1e-10
+    max_volatility = max(v for v in volatilities if v != float("inf"))
+
+    def norm(value, low, high):
+        return (value - low) / (high - low) if high > low else None
+
+    scores = []
+    for spread, depth, volume, volatility in rows:
+        norm_spread = norm(spread, min_spread, max_spread)
+        norm_depth = norm(depth, min_depth, max_depth)
+        norm_volume = norm(volume, min_volume, max_volume)
+        norm_volatility = norm(volatility, min_volatility, max_volatility)
+        scores.append(
+            100
+            * (
+                (1.0 if norm_spread is None else 1 - norm_spread) * weights[0]
+                + (1.0 if norm_depth is None else norm_depth) * weights[1]
+                + (1.0 if norm_volume is None else norm_volume) * weights[2]
+                + (1.0 if norm_volatility is None else 1 - norm_volatility) * weights[3]
+            )
+        )
+    return scores
+
+
+class TestWeightedScores(TestCase):
+    def test_matches_loop(self):
+        rows = [
+            (0.02, 1500.0, 20000.0, 0.05),
+            (0.01, 300.0, 0.0, 0.0),
+            (0.05, 0.0, 5000.0, 0.2),
+            (0.03, 800.0, 100000.0, 0.1),
+        ]
+
+        np.testing.assert_allclose(
+            weighted_scores(np.array(rows), weights), loop_scores(rows)
+        )
+
+    def test_kernel_matches_numpy(self):
+        rng = np.random.default_rng(0)
+        raw = rng.uniform(0, 1, (50, 4))
+        raw[::7, 1] = 0
+        raw[::5, 3] = 0
+
+        np.testing.assert_allclose(
+            scoring._weighted_scores_kernel(raw, weights, scoring._LOWER_IS_BETTER),
+            scoring._weighted_scores_numpy(raw, weights),
+        )
+        single = np.array([(0.02, 100.0, 10.0, 0.1)])
+        np.testing.assert_allclose(
+            scoring._weighted_scores_kernel(single, weights, scoring._LOWER_IS_BETTER),
+            scoring._weighted_scores_numpy(single, weights),
+        )
+
+    def test_no_range(self):
+        rows = [(0.02, 100.0, 10.0, 0.1), (0.02, 100.0, 10.0, 0.1)]
+
+        np.testing.assert_allclose(
+            weighted_scores(np.array(rows), weights), [100 * weights.sum()] * 2
+        )
+
+
+class TestWeightedScorer(TestCase):
+    def test_reuses_unchanged_scores(self):
+        scorer = WeightedScorer(weights)
+        raw = np.array([(0.02, 1500.0, 20000.0, 0.05), (0.05, 300.0, 5000.0, 0.2)])
+
+        scores = scorer.scores(("1", "2"), raw)
+
+        self.assertIs(scorer.scores(("1", "2"), raw.copy()), scores)
+        self.assertIsNot(scorer.scores(("2", "1"), raw), scores)
+        changed = raw.copy()
+        changed[0, 0] = 0.01
+        np.testing.assert_allclose(
+            scorer.scores(("2", "1"), changed), weighted_scores(changed, weights)
+        )
+
+
+class TestTopNIndices(TestCase):
+    def test_top_n(self):
+        scores = np.array([5.0, 90.0, 0.0, 42.0, 77.0, 13.0])
+
+        self.assertEqual(top_n_indices(scores, 3).tolist(), [1, 4, 3])
+
+    def test_n_larger_than_scores(self):
+        self.assertEqual(top_n_indices(np.array([1.0, 2.0]), 6).tolist(), [1, 0])
+        self.assertEqual(top_n_indices(np.array([]), 6).tolist(), [])
+
+
+book = {
+    "bids": [{"price": "0.48", "size": "100"}, {"price": "0.47", "size": "50"}],
+    "asks": [{"price": "0.52", "size": "30"}],
+}
+
+
+class FakeClobApi:
+    def __init__(self, books, histories):
+        self.books = books
+        self.histories = histories
+        self.history_requests = []
+
+    def get_book(self, token_id):
+        return self.books.get(token_id)
+
+    def get_price_history(self, token_id):
+        self.history_requests.append([token_id])
+        return self.histories.get(token_id)
+
+    def get_books_and_price_histories(self, token_ids):
+        books = {token_id: self.books.get(token_id) for token_id in token_ids}
+        scorable = [token_id for token_id, book in books.items() if book and book["bids"] and book["asks"]]
+        self.history_requests.append(scorable)
+        return {
+            token_id: (book, self.histories.get(token_id) if token_id in scorable else None)
+            for token_id, book in books.items()
+        }
+
+
+class TestScoreToken(TestCase):
+    def setUp(self):
+        scoring._score_cache.invalidate()
+        self.addCleanup(scoring._score_cache.invalidate)
+
+    def test_score_token(self):
+        spread, depth, volatility, price = score_token(
+            1, book, [{"p": 0.5}, {"p": 0.5}, {"p": 0.5}]
+        )
+
+        self.assertAlmostEqual(spread, 0.04)
+        self.assertEqual(depth, 180)
+        self.assertEqual(volatility, 0)
+        self.assertAlmostEqual(price, 0.5)
+
+    def test_unscorable_book(self):
+        self.assertEqual(score_token(1, None, None), (0, 0, float("inf"), 0))
+        self.assertEqual(score_token(1, {"bids": [], "asks": book["asks"]}, None), (1, 0, float("inf"), 0))
+        self.assertEqual(score_token(1, {"bids": book["bids"], "asks": []}, None), (2, 0, float("inf"), 0))
+
+    def test_get_token_score_uses_given_clob_api(self):
+        clob_api = FakeClobApi({"1": book}, {"1": [{"p": 0.4}, {"p": 0.5}]})
+
+        self.assertAlmostEqual(get_token_score("1", clob_api=clob_api)[0], 0.04)
+        self.assertEqual(clob_api.history_requests, [["1"]])
+
+    def test_get_token_scores_skips_histories_of_empty_books(self):
+        clob_api = FakeClobApi({"1": book, "2": None}, {"1": [{"p": 0.4}, {"p": 0.5}]})
+
+        scores = get_token_scores(["1", "2"], clob_api)
+
+        self.assertEqual(clob_api.history_requests, [["1"]])
+        self.assertAlmostEqual(scores["1"][2], 0.0)
+        self.assertEqual(scores["2"], (0, 0, float("inf"), 0))
+
+    def test_missing_token_id_is_not_requested(self):
+        clob_api = FakeClobApi({"1": book}, {"1": [{"p": 0.4}, {"p": 0.5}]})
+
+        self.assertEqual(get_token_score(None, clob_api=clob_api), (0, 0, float("inf"), 0))
+        self.assertEqual(get_token_scores([None, "1"], clob_api)[None], (0, 0, float("inf"), 0))
+        self.assertEqual(clob_api.history_requests, [["1"]])
+
+    def test_get_token_scores_deduplicates(self):
+        clob_api = FakeClobApi({"1": book}, {"1": [{"p": 0.4}, {"p": 0.5}]})
+
+        scores = get_token_scores(["1", "1"], clob_api)
+
+        self.assertEqual(list(scores), ["1"])
+        self.assertEqual(clob_api.history_requests, [["1"]])
+
+    def test_get_token_scores_cached(self):
+        clob_api = FakeClobApi({"1": book, "2": None}, {"1": [{"p": 0.4}, {"p": 0.5}]})
+
+        first = get_token_scores(["1", "2"], clob_api)
+        clob_api.books = {}
+        second = get_token_scores(["1", "2"], clob_api)
+
+        self.assertEqual(second["1"], first["1"])
+        # the missing book of "2" is not cached, only it is requested again
+        self.assertEqual(clob_api.history_requests, [["1"], []])
+        self.assertAlmostEqual(get_token_scores(["1"], clob_api, force_refresh=True)["1"][0], 0)
+
+    def test_get_token_scores_reuses_stale_scores_of_unchanged_tokens(self):
+        clob_api = FakeClobApi({"1": book, "2": book}, {"1": [{"p": 0.4}, {"p": 0.5}], "2": [{"p": 0.4}, {"p": 0.5}]})
+        get_token_scores(["1", "2"], clob_api)
+        for token_id in ("1", "2"):
+            score, _ = scoring._score_cache.get(token_id)
+            # age the entries past the fresh ttl
+            scoring._score_cache._entries[token_id] = (score, time.monotonic() - scoring.SCORE_CACHE_TTL - 1)
+
+        get_token_scores(["1", "2"], clob_api, changed={"2"})
+
+        self.assertEqual(clob_api.history_requests, [["1", "2"], ["2"]])
+
+
+class TestMarketActivity(TestCase):
+    def test_changed(self):
+        activity = MarketActivity()
+        markets = {"0x01": {"volume": "10", "bestBid": 0.4}, "0x02": {"volume": "5"}}
+
+        self.assertEqual(activity.changed(markets), {"0x01", "0x02"})
+        self.assertFalse(activity.unchanged(markets))
+
+        activity.mark_scored(markets)
+        self.assertTrue(activity.unchanged(markets))
+
+        traded = {**markets, "0x02": {"volume": "6"}}
+        self.assertEqual(activity.changed(traded), {"0x02"})
+        self.assertFalse(activity.unchanged({"0x01": markets["0x01"]}))
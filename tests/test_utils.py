@@ -1,6 +1,10 @@
+import json
+import os
+import tempfile
+import time
 from unittest import TestCase
 
-from utils import randomize_default_price
+from utils import math_round_down, math_round_up, randomize_default_price, write_json_atomic, TTLCache
 
 
 class TestUtils(TestCase):
@@ -11,3 +15,75 @@ class TestUtils(TestCase):
         upper_price_limit = price + 0.1
         lower_price_limit = price - 0.1
         self.assertTrue(lower_price_limit <= randomized_price <= upper_price_limit)
+
+    def test_math_round(self):
+        self.assertEqual(math_round_down(0.4837, 2), 0.48)
+        self.assertEqual(math_round_up(0.4837, 2), 0.49)
+        # already at sig_digits, but a few ulps off once scaled
+        self.assertEqual(math_round_down(0.29, 2), 0.29)
+        self.assertEqual(math_round_up(0.07, 2), 0.07)
+        self.assertEqual(math_round_down(75.6, 2), 75.6)
+        self.assertEqual(math_round_up(633.7, 2), 633.7)
+
+    def test_write_json_atomic(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "markets.json")
+            write_json_atomic(path, ["0x01"])
+            write_json_atomic(path, {"0x01": ["1", "2"]}, indent=True)
+
+            with open(path) as f:
+                self.assertEqual(json.load(f), {"0x01": ["1", "2"]})
+            self.assertEqual(os.listdir(directory), ["markets.json"])
+
+            with self.assertRaises(TypeError):
+                write_json_atomic(path, {"0x01": object()})
+            self.assertEqual(os.listdir(directory), ["markets.json"])
+
+
+class TestTTLCache(TestCase):
+    def test_fresh_stale_and_expired(self):
+        cache = TTLCache(ttl=0.05, stale_ttl=0.2)
+        self.assertEqual(cache.get("a"), (None, False))
+
+        cache.set("a", [1])
+        self.assertEqual(cache.get("a"), ([1], True))
+
+        time.sleep(0.1)
+        self.assertEqual(cache.get("a"), ([1], False))
+
+        time.sleep(0.15)
+        self.assertEqual(cache.get("a"), (None, False))
+
+    def test_invalidate(self):
+        cache = TTLCache(ttl=10)
+        cache.set("a", 1)
+        cache.set("b", 2)
+
+        cache.invalidate("a")
+        self.assertEqual(cache.get("a"), (None, False))
+        self.assertEqual(cache.get("b"), (2, True))
+
+        cache.invalidate()
+        self.assertEqual(cache.get("b"), (None, False))
+
+    def test_maxsize(self):
+        cache = TTLCache(ttl=10, maxsize=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.set("a", 3)
+        cache.set("c", 4)
+
+        # "b" was the least recently set
+        self.assertEqual(cache.get("b"), (None, False))
+        self.assertEqual(cache.get("a"), (3, True))
+        self.assertEqual(len(cache._entries), 2)
+
+    def test_set_drops_expired_entries(self):
+        cache = TTLCache(ttl=0.05)
+        cache.set("a", 1)
+        cache.set("b", 2)
+
+        time.sleep(0.1)
+        cache.set("c", 3)
+
+        self.assertEqual(list(cache._entries), ["c"])